@@ -0,0 +1,6 @@
+"""
+Benchmarks of the causaldag entry points on synthetic DAGs.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.compare baseline.json results.json
+"""
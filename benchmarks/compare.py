@@ -0,0 +1,63 @@
+"""
+Compare two benchmark result files and report the cases that got slower or used more memory.
+Exits with status 1 if any case regressed by more than the threshold.
+
+    python -m benchmarks.compare baseline.json results.json --threshold 1.2
+"""
+import argparse
+import json
+import sys
+
+
+def _key(result):
+    # Files written before the data model was recorded only have linear Gaussian data
+    data_model = result.get('data', 'linear_gaussian' if result['n_samples'] is not None else None)
+    return (result['case'], result['graph'], result['n_nodes'], result['density'], 
+            result['n_samples'], data_model, result['test'])
+
+
+def compare(baseline, current, threshold=1.2):
+    """
+    Returns:
+        list of (key, time ratio, memory ratio, regressed) for the cases present in both files
+    """
+    baseline_results = {_key(r): r for r in baseline['results']}
+    comparisons = []
+    for result in current['results']:
+        key = _key(result)
+        if key not in baseline_results:
+            continue
+        reference = baseline_results[key]
+        time_ratio = result['seconds'] / max(reference['seconds'], 1e-9)
+        memory_ratio = result['peak_memory_bytes'] / max(reference['peak_memory_bytes'], 1)
+        comparisons.append((key, time_ratio, memory_ratio, time_ratio > threshold or memory_ratio > threshold))
+    return comparisons
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=1.2, 
+                        help='ratio above which a case is reported as a regression')
+    args = parser.parse_args(argv)
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+        
+    comparisons = compare(baseline, current, threshold=args.threshold)
+    print('{:<28} {:<12} {:>7} {:>8} {:>8}'.format('case', 'graph', 'n_nodes', 'time', 'memory'))
+    for (key, time_ratio, memory_ratio, regressed) in comparisons:
+        (case, graph, n_nodes, _, _, _, _) = key
+        # Cases that do not depend on a graph (e.g. import times) have no graph nor size
+        print('{:<28} {:<12} {:>7} {:>7.2f}x {:>7.2f}x{}'.format(case, graph or '', n_nodes or '', time_ratio, memory_ratio,
+                                                                 '  REGRESSION' if regressed else ''))
+    
+    if any(regressed for (_, _, _, regressed) in comparisons):
+        sys.exit(1)
+        
+        
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+from causaldag import CausalDAG
+
+
+def random_dag(n_nodes, density=0.2, kind='erdos_renyi', seed=None):
+    """
+    Generate a random DAG over the nodes 'v0', 'v1', ...
+    
+    Params:
+        n_nodes (int): number of nodes
+        density (float): expected fraction of the pairs of nodes that are adjacent
+        kind (str): 'erdos_renyi' (each pair is adjacent with probability `density`) 
+            or 'scale_free' (preferential attachment: each new node attaches to 
+            existing nodes with probability proportional to their degree)
+        seed (int): random seed
+        
+    Returns:
+        CausalDAG
+    """
+    rng = np.random.default_rng(seed)
+    labels = ['v{}'.format(i) for i in range(n_nodes)]
+    # Edges go from earlier to later nodes in a random order, which guarantees acyclicity
+    order = [labels[i] for i in rng.permutation(n_nodes)]
+    
+    dag = CausalDAG()
+    for v in labels:
+        dag.add_node(v)
+    
+    if kind == 'erdos_renyi':
+        for i in range(n_nodes):
+            for j in range(i+1, n_nodes):
+                if rng.random() < density:
+                    dag.add_edge(order[i], order[j])
+                    
+    elif kind == 'scale_free':
+        # Number of edges added with each node, to get the requested density on average
+        n_edges = max(1, int(round(density * (n_nodes - 1) / 2)))
+        degrees = np.zeros(n_nodes)
+        for j in range(1, n_nodes):
+            weights = degrees[:j] + 1
+            parents = rng.choice(j, size=min(n_edges, j), replace=False, p=weights / weights.sum())
+            for i in parents:
+                dag.add_edge(order[i], order[j])
+                degrees[i] += 1
+                degrees[j] += 1
+    else:
+        raise ValueError('Wrong input: `kind` expects "erdos_renyi" or "scale_free"')
+        
+    return dag
+
+
+def sample_linear_gaussian(dag, n_samples, seed=None):
+    """
+    Sample from a linear structural equation model with Gaussian noise over `dag`.
+    Edge weights are drawn uniformly from [-1.5, -0.5] U [0.5, 1.5]
+    
+    Returns:
+        pandas.DataFrame with one column per node
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for v in dag.get_topological_order():
+        values = rng.normal(size=n_samples)
+        for parent in dag.get_predecessors(v):
+            weight = rng.uniform(0.5, 1.5) * rng.choice([-1, 1])
+            values += weight * data[parent]
+        # Keep the variances comparable across the graph
+        data[v] = values / values.std()
+    return pd.DataFrame(data, columns=dag.nodes())
+
+
+def sample_categorical(dag, n_samples, n_levels=3, seed=None):
+    """
+    Sample categorical variables over `dag`: each node follows a multinomial logit model 
+    whose logits are the sum of a random effect for the level of each of its parents
+    
+    Returns:
+        pandas.DataFrame with one integer column per node, with values in 0..n_levels-1
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for v in dag.get_topological_order():
+        logits = np.tile(rng.normal(size=n_levels), (n_samples, 1))
+        for parent in dag.get_predecessors(v):
+            effects = rng.normal(scale=2, size=(n_levels, n_levels))
+            logits += effects[data[parent]]
+        probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        # Inverse transform sampling, row by row
+        data[v] = (probabilities.cumsum(axis=1) < rng.random((n_samples, 1))).sum(axis=1).clip(max=n_levels-1)
+    return pd.DataFrame(data, columns=dag.nodes())
@@ -0,0 +1,114 @@
+"""
+Time the import of causaldag and of its entry points, each in a fresh interpreter,
+and record which heavy dependencies each one loads. Writes the results as JSON,
+in the format read by benchmarks.compare.
+
+    python -m benchmarks.import_time --output import_times.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from .run import _git_commit
+
+
+HEAVY_MODULES = ['numpy', 'pandas', 'scipy', 'networkx', 'statsmodels']
+
+# Benchmark case: code run after the clock starts
+CASES = {
+    'import_causaldag': 'import causaldag',
+    'import_causaldag_dag': 'from causaldag import CausalDAG',
+    'backdoor_criterion': ('from causaldag import CausalDAG\n'
+                           'dag = CausalDAG()\n'
+                           'for (v_a, v_b) in [("z", "x"), ("z", "y"), ("x", "y")]:\n'
+                           '    dag.add_edge(v_a, v_b)\n'
+                           'dag.backdoor_criterion("x", "y")'),
+    'import_fisher_z_test': 'from causaldag import FisherZTest',
+    'import_robust_linear_test': 'from causaldag import RobustLinearTest',
+    'import_ic_star': 'from causaldag import IC_star',
+}
+
+_SCRIPT = '''
+import json, sys, time, tracemalloc
+if {trace}:
+    tracemalloc.start()
+start = time.perf_counter()
+exec({code!r})
+seconds = time.perf_counter() - start
+peak_memory = tracemalloc.get_traced_memory()[1] if {trace} else None
+print(json.dumps({{'seconds': seconds, 'peak_memory': peak_memory,
+                  'modules': [m for m in {modules!r} if m in sys.modules]}}))
+'''
+
+
+def measure(code, repeat=5):
+    """
+    Returns:
+        seconds (float): best wall-clock time over `repeat` fresh interpreters
+        peak_memory (int): peak memory allocated in one more interpreter, in bytes
+        modules (list of str): heavy dependencies loaded
+    """
+    def run_script(trace):
+        script = _SCRIPT.format(trace=trace, code=code, modules=HEAVY_MODULES)
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+        return json.loads(output)
+
+    seconds = min(run_script(False)['seconds'] for _ in range(repeat))
+    # Tracing slows the imports down, so the memory is measured on a separate run
+    traced = run_script(True)
+    return seconds, traced['peak_memory'], traced['modules']
+
+
+def run(cases, repeat=5):
+    """
+    Returns:
+        list of dict, one per case
+    """
+    results = []
+    for case in cases:
+        seconds, peak_memory, modules = measure(CASES[case], repeat=repeat)
+        results.append({
+            'case': case,
+            'graph': None,
+            'n_nodes': None,
+            'density': None,
+            'n_samples': None,
+            'data': None,
+            'test': None,
+            'seconds': seconds,
+            'peak_memory_bytes': peak_memory,
+            'modules': modules,
+        })
+        print('{:<28} {:>8.4f}s {:>12,d} bytes  {}'.format(case, seconds, peak_memory, ' '.join(modules)),
+              file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='JSON file to write the results to (default: stdout)')
+    args = parser.parse_args(argv)
+
+    output = {
+        'metadata': {
+            'commit': _git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': run(args.cases, repeat=args.repeat),
+    }
+
+    if args.output is None:
+        json.dump(output, sys.stdout, indent=2)
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
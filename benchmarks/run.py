@@ -0,0 +1,179 @@
+"""
+Time and measure the peak memory of the causaldag entry points across graph sizes,
+and write the results as JSON.
+
+    python -m benchmarks.run --cases ic_star_pc_stable implications_local_markov --output results.json
+    python -m benchmarks.run --data categorical --test g_test --output categorical.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from causaldag import IC_star, Implications, FisherZTest, RobustLinearTest, GTest
+from .generators import random_dag, sample_linear_gaussian, sample_categorical
+
+
+def _treatment_and_outcome(dag):
+    # A treatment in the middle of the topological order has both ancestors (hence backdoor paths)
+    # and descendants, among which the last one is taken as outcome
+    order = dag.get_topological_order()
+    treatment = order[len(order) // 2]
+    descendants = dag.get_descendants(treatment)
+    outcomes = [v for v in order if v in descendants] or [v for v in order if v != treatment]
+    return treatment, outcomes[-1]
+
+
+def run_backdoor_criterion(dag, data, independence_test, categorical_vars):
+    dag.backdoor_criterion(*_treatment_and_outcome(dag))
+    
+    
+def run_minimal_adjustment_sets(dag, data, independence_test, categorical_vars):
+    for _ in dag.minimal_adjustment_sets(*_treatment_and_outcome(dag)):
+        pass
+    
+    
+def run_implications_all(dag, data, independence_test, categorical_vars):
+    Implications(dag, data, independence_test, categorical_vars=categorical_vars)
+
+
+def run_implications_local_markov(dag, data, independence_test, categorical_vars):
+    Implications(dag, data, independence_test, categorical_vars=categorical_vars, basis='local_markov')
+
+
+def run_ic_star_complete(dag, data, independence_test, categorical_vars):
+    IC_star(data, independence_test, categorical_vars=categorical_vars)
+
+
+def run_ic_star_pc_stable(dag, data, independence_test, categorical_vars):
+    IC_star(data, independence_test, categorical_vars=categorical_vars, skeleton='pc_stable')
+
+
+# Benchmark case: (function, whether it needs data, default graph sizes)
+CASES = {
+    'backdoor_criterion': (run_backdoor_criterion, False, [6, 8, 10, 12]),
+    'minimal_adjustment_sets': (run_minimal_adjustment_sets, False, [10, 20, 40, 80]),
+    'implications_all': (run_implications_all, True, [4, 5, 6]),
+    'implications_local_markov': (run_implications_local_markov, True, [10, 20, 40]),
+    'ic_star_complete': (run_ic_star_complete, True, [4, 5, 6]),
+    'ic_star_pc_stable': (run_ic_star_pc_stable, True, [10, 20, 40]),
+}
+
+TESTS = {
+    'fisher_z': FisherZTest,
+    'robust_linear': RobustLinearTest,
+    'g_test': GTest,
+}
+
+# Data model: function sampling data over a DAG
+DATA = {
+    'linear_gaussian': sample_linear_gaussian,
+    'categorical': sample_categorical,
+}
+
+
+def measure(function, *args, repeat=3):
+    """
+    Returns:
+        seconds (float): best wall-clock time over `repeat` runs
+        peak_memory (int): peak memory allocated during one more run, in bytes
+    """
+    seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        seconds = min(seconds, time.perf_counter() - start)
+    
+    # Tracing slows the code down, so the memory is measured on a separate run
+    tracemalloc.start()
+    function(*args)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak_memory
+
+
+def run(cases, sizes=None, graph='erdos_renyi', density=0.2, n_samples=1000, test='fisher_z', 
+        data_model='linear_gaussian', repeat=3, max_seconds=60, seed=0):
+    """
+    Run the benchmark cases over increasing graph sizes. Larger sizes of a case are skipped
+    once a run takes more than `max_seconds`. With categorical data, all the variables are
+    passed as `categorical_vars`.
+    
+    Returns:
+        list of dict, one per (case, size)
+    """
+    results = []
+    for case in cases:
+        function, needs_data, default_sizes = CASES[case]
+        for n_nodes in (sizes or default_sizes):
+            dag = random_dag(n_nodes, density=density, kind=graph, seed=seed)
+            data = DATA[data_model](dag, n_samples, seed=seed) if needs_data else None
+            categorical_vars = dag.nodes() if data_model == 'categorical' else None
+            
+            seconds, peak_memory = measure(function, dag, data, TESTS[test](), categorical_vars, repeat=repeat)
+            results.append({
+                'case': case,
+                'graph': graph,
+                'n_nodes': n_nodes,
+                'n_edges': len(dag.edges()),
+                'density': density,
+                'n_samples': n_samples if needs_data else None,
+                'data': data_model if needs_data else None,
+                'test': test if needs_data else None,
+                'seconds': seconds,
+                'peak_memory_bytes': peak_memory,
+            })
+            print('{:<28} n_nodes={:<4} {:>10.4f}s {:>12,d} bytes'.format(case, n_nodes, seconds, peak_memory),
+                  file=sys.stderr)
+            
+            if seconds > max_seconds:
+                break
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=sorted(CASES))
+    parser.add_argument('--sizes', nargs='+', type=int, help='numbers of nodes (default depends on the case)')
+    parser.add_argument('--graph', choices=['erdos_renyi', 'scale_free'], default='erdos_renyi')
+    parser.add_argument('--density', type=float, default=0.2)
+    parser.add_argument('--n-samples', type=int, default=1000)
+    parser.add_argument('--data', choices=sorted(DATA), default='linear_gaussian')
+    parser.add_argument('--test', choices=sorted(TESTS), default='fisher_z')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-seconds', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON file to write the results to (default: stdout)')
+    args = parser.parse_args(argv)
+    
+    results = run(args.cases, sizes=args.sizes, graph=args.graph, density=args.density, n_samples=args.n_samples,
+                  test=args.test, data_model=args.data, repeat=args.repeat, max_seconds=args.max_seconds, seed=args.seed)
+    output = {
+        'metadata': {
+            'commit': _git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    
+    if args.output is None:
+        json.dump(output, sys.stdout, indent=2)
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+            
+            
+if __name__ == '__main__':
+    main()
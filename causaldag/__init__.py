@@ -1,4 +1,38 @@
+import importlib
+
 from .graphs import Graph, CausalDAG
-from .validation import Implications
-from .independence import RobustLinearTest
-from .inference import IC_star
\ No newline at end of file
+
+# The other classes are imported when first used, so that the graph algorithms can be used
+# without loading the numerical dependencies (numpy, pandas, scipy, networkx)
+_LAZY_IMPORTS = {
+    'Implications': '.validation',
+    'RobustLinearTest': '.independence',
+    'FisherZTest': '.independence',
+    'LinearRegressionTest': '.independence',
+    'GTest': '.independence',
+    'RandomFeatureTest': '.independence',
+    'CachedIndependenceTest': '.independence',
+    'SequentialTest': '.independence',
+    'IC_star': '.inference',
+    'SerialExecutor': '.executors',
+    'ThreadPoolExecutor': '.executors',
+    'ProcessPoolExecutor': '.executors',
+    'SufficientStatistics': '.statistics',
+    'Instrumentation': '.instrumentation',
+    'InferenceCancelled': '.instrumentation',
+    'StabilitySelection': '.stability',
+}
+
+__all__ = ['Graph', 'CausalDAG'] + list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
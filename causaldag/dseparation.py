@@ -0,0 +1,182 @@
+import numpy as np
+from .graphs import _as_set, _bits
+
+
+class DSeparationIndex():
+    """
+    Immutable index of a CausalDAG, precomputed once to answer many d-separation queries.
+    Build it with `CausalDAG.freeze()`. Later changes to the DAG do not affect the index.
+
+    The queries are answered in the moral graph of the ancestors of x, y and Z: x and y are
+    d-separated by Z iff Z disconnects them in that graph. Batches of queries are answered
+    together, by expanding the nodes reachable from each x one step at a time with
+    matrix products.
+
+    The index holds no mutable state and its arrays are read-only, so it can be shared between threads.
+
+    Attributes:
+        nodes (tuple of str): nodes of the DAG; queries refer to them by position
+        index (dict): position of each node
+        topological_order (tuple of str): nodes ordered so that parents come before their children
+        ancestors (tuple of int): bitset of the ancestors of each node
+        descendants (tuple of int): bitset of the descendants of each node
+        reachability (numpy.ndarray): reachability[i, j] is true iff there is a directed path from i to j
+        parents (numpy.ndarray): parents[i, j] is true iff j is a parent of i
+        children (numpy.ndarray): children[i, j] is true iff j is a child of i
+        adjacency (numpy.ndarray): adjacency[i, j] is true iff i and j are adjacent
+    """
+    # Number of queries processed together, to bound the memory used
+    BATCH_SIZE = 4096
+
+    def __init__(self, dag):
+        """
+        Params:
+            dag (CausalDAG): the DAG to index
+        """
+        self.nodes = tuple(dag.nodes())
+        self.index = {v: i for i, v in enumerate(self.nodes)}
+        self.topological_order = tuple(dag.get_topological_order())
+        n = len(self.nodes)
+
+        parents = [sum(1 << self.index[p] for p in dag.get_predecessors(v)) for v in self.nodes]
+        children = [sum(1 << self.index[c] for c in dag.get_successors(v)) for v in self.nodes]
+
+        # Ancestors follow the topological order, descendants the reverse order
+        ancestors = [0] * n
+        for v in self.topological_order:
+            i = self.index[v]
+            for j in _bits(parents[i]):
+                ancestors[i] |= ancestors[j] | (1 << j)
+        descendants = [0] * n
+        for v in reversed(self.topological_order):
+            i = self.index[v]
+            for j in _bits(children[i]):
+                descendants[i] |= descendants[j] | (1 << j)
+        self.ancestors = tuple(ancestors)
+        self.descendants = tuple(descendants)
+
+        self.reachability = _to_matrix(descendants, n)
+        self.parents = _to_matrix(parents, n)
+        self.children = _to_matrix(children, n)
+        self.adjacency = _read_only(self.parents | self.children)
+
+        # Products are computed in floating point, which uses the fast matrix multiplication routines
+        self._ancestors_or_self = _read_only((self.reachability.T | np.eye(n, dtype=bool)).astype(np.float32))
+        self._adjacency = _read_only(self.adjacency.astype(np.float32))
+        self._children = _read_only(self.children.astype(np.float32))
+        self._parents = _read_only(self.parents.astype(np.float32))
+
+    def get_ancestors(self, v):
+        """
+        Get all ancestors of `v`
+        """
+        return self._to_labels(self.ancestors[self.index[v]])
+
+    def get_descendants(self, v):
+        """
+        Get all descendants of `v`
+        """
+        return self._to_labels(self.descendants[self.index[v]])
+
+    def is_dseparated(self, x, y, z=None):
+        """
+        Find if nodes `x` and `y` are d-separated given the nodes `z`
+
+        Returns:
+            bool
+        """
+        return bool(self.is_dseparated_many([(x, y, z)])[0])
+
+    def is_dseparated_many(self, queries):
+        """
+        Params:
+            queries (iterable of tuples): (x, y, z) queries, with `x` and `y` nodes and `z` a node, a list of nodes or None
+
+        Returns:
+            numpy.ndarray of bool, one per query
+        """
+        x, y, z = self.encode(queries)
+        return self.is_dseparated_batch(x, y, z)
+
+    def encode(self, queries):
+        """
+        Convert (x, y, z) queries given with node labels to the arrays of `is_dseparated_batch`.
+        As in `CausalDAG.is_dseparated`, `z` can be a node, a collection of nodes or None
+        """
+        queries = list(queries)
+        x = np.array([self.index[v_a] for (v_a, _, _) in queries], dtype=np.intp)
+        y = np.array([self.index[v_b] for (_, v_b, _) in queries], dtype=np.intp)
+        z = np.zeros((len(queries), len(self.nodes)), dtype=bool)
+        for row, (_, _, z_set) in enumerate(queries):
+            z[row, [self.index[v] for v in _as_set(z_set)]] = True
+        return x, y, z
+
+    def is_dseparated_batch(self, x, y, z):
+        """
+        Answer a batch of d-separation queries. Nodes of `x` and `y` that appear in `z` are ignored.
+
+        Params:
+            x (numpy.ndarray of int): position of the node x of each query
+            y (numpy.ndarray of int): position of the node y of each query
+            z (numpy.ndarray of bool): one row per query, true for the conditioned nodes
+
+        Returns:
+            numpy.ndarray of bool, one per query
+        """
+        x, y = np.asarray(x, dtype=np.intp), np.asarray(y, dtype=np.intp)
+        z = np.asarray(z, dtype=bool)
+        if not (x.ndim == 1 and x.shape == y.shape and z.shape == (len(x), len(self.nodes))):
+            raise ValueError('Wrong input: expects k positions of x, k positions of y and a k by n mask of z')
+
+        separated = np.empty(len(x), dtype=bool)
+        for start in range(0, len(x), self.BATCH_SIZE):
+            rows = slice(start, start + self.BATCH_SIZE)
+            separated[rows] = self._is_dseparated_batch(x[rows], y[rows], z[rows])
+        return separated
+
+    def _is_dseparated_batch(self, x, y, z):
+        k = len(x)
+        rows = np.arange(k)
+        source = np.zeros((k, len(self.nodes)), dtype=bool)
+        source[rows, x] = True
+        target = np.zeros_like(source)
+        target[rows, y] = True
+        z = z & ~source & ~target
+
+        # Step 1: ancestral set of x, y and Z
+        ancestral = (source | target | z).astype(np.float32) @ self._ancestors_or_self > 0
+        allowed = ancestral & ~z
+
+        # Step 2: frontier expansion in the moral graph of the ancestral set, avoiding Z.
+        # Two nodes are adjacent there if they are adjacent in the DAG, or are parents of
+        # a common child in the ancestral set
+        reached = source.copy()
+        frontier = source.astype(np.float32)
+        active = rows
+        while len(active) > 0:
+            common_children = (frontier @ self._children > 0) & ancestral[active]
+            neighbors = (frontier @ self._adjacency > 0) | (common_children.astype(np.float32) @ self._parents > 0)
+            new = neighbors & allowed[active] & ~reached[active]
+            reached[active] |= new
+
+            # Queries whose y was reached or whose frontier is empty are answered
+            keep = new.any(axis=1) & ~reached[active, y[active]]
+            active = active[keep]
+            frontier = new[keep].astype(np.float32)
+
+        return ~reached[rows, y]
+
+    def _to_labels(self, bitset):
+        return [self.nodes[i] for i in _bits(bitset)]
+
+
+def _to_matrix(bitsets, n):
+    matrix = np.zeros((n, n), dtype=bool)
+    for i, bitset in enumerate(bitsets):
+        matrix[i, list(_bits(bitset))] = True
+    return _read_only(matrix)
+
+
+def _read_only(array):
+    array.setflags(write=False)
+    return array
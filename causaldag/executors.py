@@ -0,0 +1,259 @@
+import concurrent.futures
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from .independence import run_test
+
+
+class SerialExecutor():
+    """
+    Runs independence tests one after the other in the current process
+    """
+    def map(self, function, items, data, callback=None, context=None):
+        """
+        Apply `function(item, data)`, or `function(item, data, context)` if a context is given, to every item
+        
+        Params:
+            function (callable): module-level function taking an item and the data
+            items (list): items to process
+            data (pandas.DataFrame): data shared by all the calls
+            callback (callable): called as `callback(i, result)` when the result of the i-th
+                item is available, in order. If it raises, the remaining items are abandoned
+            context (object): object shared by all the calls, e.g. the independence test.
+                A pool of processes receives it once, with the data, and keeps it between the
+                calls, so that what it caches is reused. Changes made to it afterwards are not seen
+                by the pool until it is given another context or data
+            
+        Returns:
+            list of results, in the same order as `items`
+        """
+        results = []
+        for i, item in enumerate(items):
+            results.append(_call(function, item, data, context))
+            if callback is not None:
+                callback(i, results[-1])
+        return results
+    
+    def map_tests(self, independence_test, data, queries, callback=None):
+        """
+        Run an independence test for each query
+        
+        Params:
+            independence_test (test object): method for testing independence between variables
+            data (pandas.DataFrame): data to test
+            queries (list of tuples): (x, y, z, categorical_outcome) arguments of each test
+            callback (callable): called as `callback(latencies)` with the duration in seconds of
+                each test, as the tests complete
+            
+        Returns:
+            list of IndependenceTestResult, in the same order as `queries`
+        """
+        def on_chunk(i, chunk_results):
+            if callback is not None:
+                callback([latency for (_, latency) in chunk_results])
+            
+        chunks = self.map(_run_tests, self._split(queries), data, callback=on_chunk, context=independence_test)
+        return [result for chunk_results in chunks for (result, _) in chunk_results]
+    
+    def shutdown(self):
+        pass
+    
+    def _split(self, queries):
+        return [list(queries)]
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.shutdown()
+
+
+class ThreadPoolExecutor(SerialExecutor):
+    """
+    Runs independence tests on a pool of threads sharing the data.
+    Only useful when the test releases the GIL (e.g. most of its time is spent in NumPy).
+    The test object must implement `test`, as `fit` mutates the object.
+    """
+    def __init__(self, max_workers=None):
+        """
+        Params:
+            max_workers (int): number of threads. Default is the number of CPUs
+        """
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self._pool = None
+        
+    def map(self, function, items, data, callback=None, context=None):
+        if self._pool is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        return _collect([self._pool.submit(_call, function, item, data, context) for item in items], callback)
+    
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+            
+    def _split(self, queries):
+        return _split(queries, 4*self.max_workers)
+    
+
+class ProcessPoolExecutor(SerialExecutor):
+    """
+    Runs independence tests on a pool of processes.
+    The numerical columns of the data are placed once in shared memory, which the workers
+    read without copying; the remaining columns, and the context (e.g. the independence test),
+    are sent once to each worker, which keeps them between tasks.
+    The pool is kept alive, and the data shared, as long as the same data and context are used.
+    """
+    def __init__(self, max_workers=None):
+        """
+        Params:
+            max_workers (int): number of processes. Default is the number of CPUs
+        """
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self._pool = None
+        self._data = None
+        self._context = None
+        self._shared_blocks = []
+        
+    def map(self, function, items, data, callback=None, context=None):
+        if self._pool is None or self._data is not data or self._context is not context:
+            self.shutdown()
+            self._start(data, context)
+        return _collect([self._pool.submit(_call_in_worker, (function, item)) for item in items], callback)
+    
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        for block in self._shared_blocks:
+            block.close()
+            block.unlink()
+        self._shared_blocks = []
+        self._data = None
+        self._context = None
+    
+    def _split(self, queries):
+        return _split(queries, 4*self.max_workers)
+    
+    def _start(self, data, context):
+        spec, self._shared_blocks = _share_data(data)
+        self._data = data
+        self._context = context
+        self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers,
+                                                            initializer=_initialize_worker,
+                                                            initargs=(spec, context))
+        
+        
+def _collect(futures, callback):
+    """
+    Wait for the futures in order. If anything goes wrong (including in the callback), 
+    the futures that have not started yet are cancelled.
+    """
+    results = []
+    try:
+        for i, future in enumerate(futures):
+            results.append(future.result())
+            if callback is not None:
+                callback(i, results[-1])
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    return results
+
+
+def _split(queries, n_chunks):
+    """
+    Split the queries into at most `n_chunks` contiguous chunks
+    """
+    queries = list(queries)
+    size = max(1, -(-len(queries) // n_chunks))
+    return [queries[i:i+size] for i in range(0, len(queries), size)]
+
+
+def _call(function, item, data, context):
+    if context is None:
+        return function(item, data)
+    return function(item, data, context)
+
+
+def _run_tests(queries, data, independence_test):
+    """
+    Returns:
+        list of (IndependenceTestResult, duration in seconds)
+    """
+    return [timed_test(independence_test, x, y, z, data, categorical_outcome=categorical_outcome) 
+            for (x, y, z, categorical_outcome) in queries]
+
+
+def timed_test(independence_test, x, y, z, data, categorical_outcome=False):
+    """
+    Run an independence test
+    
+    Returns:
+        IndependenceTestResult, duration of the test in seconds
+    """
+    start = time.perf_counter()
+    result = run_test(independence_test, x, y, z, data, categorical_outcome=categorical_outcome)
+    return result, time.perf_counter() - start
+
+
+def _share_data(data):
+    """
+    Place the numerical columns of a DataFrame in shared memory
+    
+    Returns:
+        spec (tuple): description of the data to rebuild it in the workers
+        blocks (list of SharedMemory): shared memory blocks owned by the caller
+    """
+    if not isinstance(data, pd.DataFrame):
+        # Other data (e.g. precomputed statistics) is small enough to be sent as is
+        return ('object', data), []
+    
+    blocks = []
+    columns = []
+    for column in data.columns:
+        values = data[column].to_numpy()
+        if values.dtype.kind in 'biuf' and values.nbytes > 0:
+            block = shared_memory.SharedMemory(create=True, size=values.nbytes)
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+            blocks.append(block)
+            columns.append((column, 'shared', block.name, values.dtype.str, len(values)))
+        else:
+            columns.append((column, 'object', data[column], None, None))
+    return ('dataframe', (columns, data.index)), blocks
+
+
+_worker_data = None
+_worker_context = None
+_worker_blocks = []
+
+
+def _initialize_worker(spec, context):
+    """
+    Rebuild the data in a worker process, on top of the shared memory blocks, and keep the context
+    """
+    global _worker_data, _worker_context
+    _worker_context = context
+    (kind, content) = spec
+    if kind == 'object':
+        _worker_data = content
+        return
+    
+    (columns, index) = content
+    values = {}
+    for (column, storage, content, dtype, length) in columns:
+        if storage == 'shared':
+            block = shared_memory.SharedMemory(name=content)
+            _worker_blocks.append(block)
+            values[column] = np.ndarray((length,), dtype=np.dtype(dtype), buffer=block.buf)
+        else:
+            values[column] = content
+    _worker_data = pd.DataFrame(values, index=index, copy=False)
+    
+    
+def _call_in_worker(task):
+    (function, item) = task
+    return _call(function, item, _worker_data, _worker_context)
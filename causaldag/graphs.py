@@ -1,19 +1,47 @@
-import networkx as nx
-from networkx.algorithms import simple_paths
-from collections import defaultdict
+from collections import deque
 from .utils import get_all_possible_sets
 
 class Graph():
     """
-    Represents a causal graph and is a wrapper around the networkx.Graph class
+    Represents a causal graph.
+    
+    Nodes are mapped to integers, and the adjacency and orientation of the edges are stored
+    as bitsets (one Python integer per node), which makes the graph compact, cheap to copy 
+    and picklable.
     """
     
     def __init__(self):
-        # Initialize a simple networkx Graph (undirected)
-        self.G = nx.Graph()
+        # Label of each node, and position of each label
+        self._labels = []
+        self._index = {}
+        
+        # Bitsets of the adjacent nodes, of the nodes pointed to (children)
+        # and of the nodes pointing to (parents) each node
+        self._adjacency = []
+        self._children = []
+        self._parents = []
         
-        # Initialize an edge orientation graph
-        self._edge_orient_dict = defaultdict(lambda: defaultdict(str))
+    @property
+    def G(self):
+        """
+        Undirected networkx.Graph with the same nodes and edges, built on demand. Requires networkx
+        """
+        nx = _import_networkx()
+        G = nx.Graph()
+        G.add_nodes_from(self.nodes())
+        G.add_edges_from(self.edges())
+        return G
+        
+    def add_node(self, v):
+        """
+        Add node `v` to the graph, if not already present
+        """
+        if v not in self._index:
+            self._index[v] = len(self._labels)
+            self._labels.append(v)
+            self._adjacency.append(0)
+            self._children.append(0)
+            self._parents.append(0)
         
     def add_edge(self, v_a, v_b):
         """
@@ -23,7 +51,11 @@ class Graph():
             v_a (str): node `a`
             v_b (str): node `b`
         """
-        self.G.add_edge(v_a, v_b)
+        self.add_node(v_a)
+        self.add_node(v_b)
+        i, j = self._index[v_a], self._index[v_b]
+        self._adjacency[i] |= 1 << j
+        self._adjacency[j] |= 1 << i
         self.set_edge_orientation(v_a, v_b, set_null=True)
     
     def edges(self):
@@ -31,56 +63,68 @@ class Graph():
         Returns:
             list of tuples
         """
-        return self.G.edges()
+        return [(self._labels[i], self._labels[j]) 
+                for i in range(len(self._labels)) for j in _bits(self._adjacency[i] >> (i+1) << (i+1))]
     
     def nodes(self):
         """
         Returns:
             list of str
         """
-        return self.G.nodes()
+        return list(self._labels)
     
     def get_neighbors(self, v):
         """
         Get adjacent nodes
         """
-        return self.G.neighbors(v)
+        return self._to_labels(self._adjacency[self._index[v]])
     
     def get_successors(self, v):
         """
         Get successors - adjacent nodes in that are caused by `v`
         """
-        neighbors = self.get_neighbors(v)
-        return [n for n in neighbors if self.get_edge_orientation(v, n) == n]
+        return self._to_labels(self._children[self._index[v]])
+    
+    def get_predecessors(self, v):
+        """
+        Get predecessors - adjacent nodes that cause `v`
+        """
+        return self._to_labels(self._parents[self._index[v]])
+    
+    def get_ancestors(self, v):
+        """
+        Get all ancestors of `v`
+        """
+        return self._to_labels(self._closure(1 << self._index[v], self._parents))
     
     def get_descendants(self, v):
         """
         Get all descendants of `v`
         """
-        descendants = set()
-        visited = set()
-        to_visit = [v]
-        
-        while len(to_visit) > 0:
-            current_node = to_visit.pop()
-            visited.add(current_node)
-            for successor in self.get_successors(current_node):
-                descendants.add(successor)
-                if successor not in visited:
-                    to_visit.append(successor)
-                    
-        return list(descendants)
+        return self._to_labels(self._closure(1 << self._index[v], self._children))
     
     def remove_edge(self, v_a, v_b):
         """
         Remove edge from the graph
         """
-        self.G.remove_edge(v_a, v_b)
-        del self._edge_orient_dict[v_b][v_a]
-        del self._edge_orient_dict[v_a][v_b]
+        i, j = self._index[v_a], self._index[v_b]
+        if not self._adjacency[i] >> j & 1:
+            raise ValueError('There is no edge between {} and {}'.format(v_a, v_b))
+        self.set_edge_orientation(v_a, v_b, set_null=True)
+        self._adjacency[i] &= ~(1 << j)
+        self._adjacency[j] &= ~(1 << i)
     
     def get_edge_orientation(self, v_a, v_b):
-        return self._edge_orient_dict[v_a][v_b]
+        """
+        Return the node the edge between `v_a` and `v_b` points to,
+        or None if the edge is undirected or does not exist
+        """
+        i, j = self._index[v_a], self._index[v_b]
+        if self._children[i] >> j & 1:
+            return v_b
+        if self._children[j] >> i & 1:
+            return v_a
+        return None
     
     def set_edge_orientation(self, v_a, v_b, set_null=False):
         """
@@ -92,20 +136,257 @@ class Graph():
             set_null (bool): if true, then the edge is considered undirected. 
                 If false (default), then the edge is considered directed from `a` to `b`
         """
-        if set_null is False:
-            self._edge_orient_dict[v_a][v_b] = v_b
-            self._edge_orient_dict[v_b][v_a] = v_b
-        elif set_null is True:
-            self._edge_orient_dict[v_a][v_b] = None
-            self._edge_orient_dict[v_b][v_a] = None
-        else:
+        if set_null not in (True, False):
             raise ValueError('Wrong input: `set_null` expects bool')
+        
+        i, j = self._index[v_a], self._index[v_b]
+        if not self._adjacency[i] >> j & 1:
+            raise ValueError('There is no edge between {} and {}'.format(v_a, v_b))
+        
+        self._children[i] &= ~(1 << j)
+        self._children[j] &= ~(1 << i)
+        self._parents[i] &= ~(1 << j)
+        self._parents[j] &= ~(1 << i)
+        if set_null is False:
+            self._children[i] |= 1 << j
+            self._parents[j] |= 1 << i
+            
+    def copy(self):
+        """
+        Return a copy of the graph
+        """
+        graph = type(self).__new__(type(self))
+        graph._labels = list(self._labels)
+        graph._index = dict(self._index)
+        graph._adjacency = list(self._adjacency)
+        graph._children = list(self._children)
+        graph._parents = list(self._parents)
+        return graph
             
     def get_all_paths(self, v_a, v_b):
         """
-        Return all the paths (causal and non-causal alike) between `v_a` `and v_b`
+        Return all the paths (causal and non-causal alike) between `v_a` `and v_b`.
+        Their number can grow exponentially with the size of the graph: use `iter_paths`
+        or `has_path` when not all of them are needed.
+        """
+        return list(self.iter_paths(v_a, v_b))
+    
+    def iter_paths(self, v_a, v_b, backdoor=False, directed=False):
+        """
+        Yield the paths between `v_a` and `v_b` one at a time, so that the caller can stop
+        as soon as it has found what it needs
+        
+        Params:
+            v_a, v_b (str): end nodes of the paths
+            backdoor (bool): only yield the paths whose first edge points into `v_a`
+            directed (bool): only yield the directed paths from `v_a` to `v_b`
+            
+        Returns:
+            generator of paths, as lists of nodes from `v_a` to `v_b`
+        """
+        source, target, first_step, step = self._path_search(v_a, v_b, backdoor, directed)
+        if directed:
+            # Only the ancestors of `v_b` can be on a directed path to it
+            allowed = self._closure(1 << target, self._parents) | (1 << target)
+        else:
+            allowed = -1
+        
+        path = [source]
+        # Depth-first search, keeping the neighbors left to visit at each step of the path
+        to_visit = [first_step & allowed]
+        
+        while len(to_visit) > 0:
+            if to_visit[-1] == 0:
+                to_visit.pop()
+                path.pop()
+                continue
+            next_node = to_visit[-1] & -to_visit[-1]
+            to_visit[-1] ^= next_node
+            j = next_node.bit_length() - 1
+            if j in path:
+                continue
+            if j == target:
+                yield [self._labels[i] for i in path + [j]]
+                continue
+            path.append(j)
+            to_visit.append(step[j] & allowed)
+    
+    def has_path(self, v_a, v_b, backdoor=False, directed=False):
+        """
+        Find if there is at least one path between `v_a` and `v_b`, in time linear in the size 
+        of the graph. Same parameters as `iter_paths`.
+        
+        Returns:
+            bool
+        """
+        source, target, first_step, step = self._path_search(v_a, v_b, backdoor, directed)
+        # A path exists iff `v_b` can be reached from the first step without going through `v_a`
+        excluded = ~(1 << source)
+        reached = first_step | self._closure(first_step & excluded, [nodes & excluded for nodes in step])
+        return bool(reached >> target & 1)
+    
+    def _path_search(self, v_a, v_b, backdoor, directed):
+        """
+        Returns:
+            indices of `v_a` and `v_b`, bitset of the first steps of the paths and bitsets of the next steps
+        """
+        if backdoor and directed:
+            raise ValueError('Wrong input: a directed path cannot start with an edge into its first node')
+        
+        source, target = self._index[v_a], self._index[v_b]
+        step = self._children if directed else self._adjacency
+        first_step = self._parents[source] if backdoor else step[source]
+        return source, target, first_step, step
+    
+    def _to_labels(self, bitset):
+        return [self._labels[i] for i in _bits(bitset)]
+    
+    def _to_bitset(self, nodes):
+        bitset = 0
+        for v in nodes:
+            bitset |= 1 << self._index[v]
+        return bitset
+    
+    def _closure(self, bitset, step):
+        """
+        Bitset of the nodes reached from `bitset` by following `step` (children or parents)
+        one or more times
+        """
+        reached = 0
+        frontier = bitset
+        while frontier:
+            next_frontier = 0
+            for i in _bits(frontier):
+                next_frontier |= step[i]
+            frontier = next_frontier & ~reached
+            reached |= next_frontier
+        return reached
+    
+    def get_dconnected_nodes(self, x, z=None):
+        """
+        Find all the nodes that are d-connected to `x` given `z`, using a reachability
+        (Bayes-ball) search. Runs in time linear in the size of the graph.
+        
+        Params:
+            x (str or list of str): source node(s)
+            z (str or list of str): conditioned node(s)
+            
+        Returns:
+            set of str
+        """
+        return self._reachable(_as_set(x), _as_set(z))
+    
+    def is_dseparated(self, x, y, z=None):
+        """
+        Find if `x` and `y` are d-separated given `z`, i.e. if every path between them
+        is blocked. Nodes of `x` and `y` that appear in `z` are ignored.
+        
+        Params:
+            x (str or list of str): node(s) `x`
+            y (str or list of str): node(s) `y`
+            z (str or list of str): conditioned node(s)
+        """
+        x, y = _as_set(x), _as_set(y)
+        z = _as_set(z) - x - y
+        return len(self._reachable(x, z, targets=y)) == 0
+    
+    def _reachable(self, x, z, targets=None):
+        """
+        Bayes-ball search of the nodes reachable from `x` along active paths given `z`.
+        Each node is visited at most twice: once coming from a child (moving up the
+        edges) and once coming from a parent (moving down the edges).
+        If `targets` is given, stop as soon as one of them is reached and return it.
+        """
+        x, z = self._to_bitset(x), self._to_bitset(z)
+        if targets is not None:
+            targets = self._to_bitset(targets)
+        
+        # Colliders are open if they are conditioned on or have a conditioned descendant
+        z_ancestors = z | self._closure(z, self._parents)
+        
+        reachable = 0
+        visited_up, visited_down = 0, 0
+        to_visit_up, to_visit_down = x, 0
+        
+        while to_visit_up or to_visit_down:
+            # Coming from a child: the trail continues both up and down
+            to_visit_up &= ~visited_up
+            visited_up |= to_visit_up
+            # Coming from a parent: the trail continues down through a non-collider
+            # and back up through an open collider
+            to_visit_down &= ~visited_down
+            visited_down |= to_visit_down
+            
+            reachable |= (to_visit_up | to_visit_down) & ~z & ~x
+            if targets is not None and reachable & targets:
+                return set(self._to_labels(reachable & targets)[:1])
+            
+            next_up, next_down = 0, 0
+            for i in _bits(to_visit_up & ~z):
+                next_up |= self._parents[i]
+                next_down |= self._children[i]
+            for i in _bits(to_visit_down):
+                if not z >> i & 1:
+                    next_down |= self._children[i]
+                if z_ancestors >> i & 1:
+                    next_up |= self._parents[i]
+            to_visit_up, to_visit_down = next_up, next_down
+        
+        if targets is not None:
+            return set()
+        return set(self._to_labels(reachable))
+    
+    def minimal_dseparators(self, x, y, restrict=None):
+        """
+        Lazily yield the minimal sets Z that d-separate `x` and `y`, with polynomial delay
+        between two consecutive sets. Minimal separators only contain ancestors of `x` and `y`,
+        so the search is done on the moralized ancestral graph of `x` and `y`.
+        
+        Params:
+            x (str): node `x`
+            y (str): node `y`
+            restrict (list of str): nodes allowed in the separating sets. Default is all nodes
+            
+        Yields:
+            tuple of str
+        """
+        adjacency = self._separation_graph(x, y, restrict)
+        for z in _minimal_vertex_separators(adjacency, x, y):
+            yield tuple(v for v in self.nodes() if v in z)
+    
+    def _separation_graph(self, x, y, restrict=None):
+        """
+        Build the moralized ancestral graph of `x` and `y` where the nodes that are not allowed
+        in a separating set have been eliminated: a set of allowed nodes d-separates `x` and `y`
+        iff it separates them in that undirected graph.
+        
+        Returns:
+            dict of str to set of str: adjacency of the undirected graph
         """
-        return list(simple_paths.all_simple_paths(self.G, v_a, v_b))
+        ancestral_set = set(self.get_ancestors(x)) | set(self.get_ancestors(y)) | set([x, y])
+        
+        # Moralize: keep the edges and marry the parents of a common child
+        adjacency = {v: set() for v in ancestral_set}
+        for v in ancestral_set:
+            parents = self.get_predecessors(v)
+            for i, p in enumerate(parents):
+                adjacency[v].add(p)
+                adjacency[p].add(v)
+                for q in parents[i+1:]:
+                    adjacency[p].add(q)
+                    adjacency[q].add(p)
+        
+        # Eliminate the nodes that cannot be conditioned on: connecting all their neighbors
+        # preserves the separation between the remaining nodes
+        if restrict is not None:
+            allowed = set(restrict)
+            for v in [v for v in ancestral_set if v not in allowed and v not in (x, y)]:
+                neighbors = adjacency.pop(v)
+                for n in neighbors:
+                    adjacency[n].discard(v)
+                    adjacency[n].update(m for m in neighbors if m != n)
+                
+        return adjacency
     
     def __str__(self):
         s = ''
@@ -124,9 +405,41 @@ class CausalDAG(Graph):
         super().__init__()
         
     def add_edge(self, v_a, v_b):
-        self.G.add_edge(v_a, v_b)
+        super().add_edge(v_a, v_b)
         self.set_edge_orientation(v_a, v_b)
         
+    def get_topological_order(self):
+        """
+        Return the nodes sorted so that every node comes after its parents
+        """
+        in_degrees = {v: len(self.get_predecessors(v)) for v in self.nodes()}
+        to_visit = [v for v in self.nodes() if in_degrees[v] == 0]
+        order = []
+        
+        while len(to_visit) > 0:
+            current_node = to_visit.pop(0)
+            order.append(current_node)
+            for successor in self.get_successors(current_node):
+                in_degrees[successor] -= 1
+                if in_degrees[successor] == 0:
+                    to_visit.append(successor)
+                    
+        if len(order) != len(in_degrees):
+            raise ValueError('The graph has a directed cycle')
+        return order
+    
+    def freeze(self):
+        """
+        Precompute an immutable index of the current DAG (ancestors, descendants, 
+        topological order and reachability) that answers many d-separation queries 
+        at once, and can be shared between threads. Requires numpy
+        
+        Returns:
+            DSeparationIndex
+        """
+        from .dseparation import DSeparationIndex
+        return DSeparationIndex(self)
+        
     def backdoor_criterion(self, v_a, v_b):
         """Find the sets Z that satisfy the backdoor criterion between X and Y
         
@@ -147,29 +460,225 @@ class CausalDAG(Graph):
         # Step 1c: Get all possible conditioning sets from the list of non-descendants
         candidate_sets = get_all_possible_sets(nondescendants)
         
-        # Step 2: Find all backdoor paths from treatment to outcome
-        # In other words, paths which are non-causal and have an arrow pointing to treatment
-        
-        # Step 2a: Get all paths
-        paths = self.get_all_paths(v_a, v_b)
-        
-        # Step 2b: Filter down to those with an arrow to treatment 
-        backdoor_paths = []
-        
-        for p in paths:
-            if self.get_edge_orientation(v_a, p[1]) == v_a:
-                backdoor_paths.append(Path(nodes=p, graph=self))
-        
-        if len(backdoor_paths) == 0:
+        # Step 2: Check that there is at least one backdoor path from treatment to outcome
+        # In other words, a path which is non-causal and has an arrow pointing to treatment
+        if not self.has_path(v_a, v_b, backdoor=True):
             return ()
         
-        # Step 3: Identify candidate sets that dseparates all backdoor path
+        # Step 3: Identify candidate sets that dseparates all backdoor paths.
+        # Once the arrows out of treatment are removed, the only remaining paths are
+        # the backdoor paths, so a set blocks all of them iff it d-separates X and Y
+        backdoor_graph = self._backdoor_graph(v_a)
         z_sets = []
         for z in candidate_sets:
-            if all([p.is_dseparated(z=z) for p in backdoor_paths]):
+            if backdoor_graph.is_dseparated(v_a, v_b, z):
                 z_sets.append(z)
 
         return z_sets
+    
+    def is_backdoor_set(self, v_a, v_b, z):
+        """
+        Find if the set `z` satisfies the backdoor criterion between X and Y
+        """
+        z = _as_set(z)
+        if len(z & set(self.get_descendants(v_a))) > 0 or v_a in z:
+            return False
+        return self._backdoor_graph(v_a).is_dseparated(v_a, v_b, z)
+    
+    def minimal_adjustment_sets(self, v_a, v_b):
+        """Lazily yield the minimal sets Z that satisfy the backdoor criterion between X and Y
+        
+        The sets are enumerated with polynomial delay, without going through all the possible
+        subsets of non-descendants of X. If X and Y have no open backdoor path, the empty set
+        is the only minimal set.
+        
+        Params:
+            v_a (str): treatment X
+            v_b (str): outcome Y
+            
+        Yields:
+            tuple of str
+        """
+        nondescendants = self._nondescendants(v_a)
+        for z in self._backdoor_graph(v_a).minimal_dseparators(v_a, v_b, restrict=nondescendants):
+            yield z
+    
+    def optimal_adjustment_set(self, v_a, v_b):
+        """Find the optimal set Z that satisfies the backdoor criterion between X and Y
+        
+        The optimal set is made of the parents of the nodes on the causal paths from X to Y,
+        excluding X and the descendants of those nodes. Among all valid adjustment sets, it gives
+        the smallest asymptotic variance (Henckel, Perkovic and Maathuis, 2019).
+        If Y is not a descendant of X, the set with the fewest variables is returned instead.
+        
+        Returns:
+            tuple of str, or None if no set satisfies the backdoor criterion
+        """
+        # Nodes on the causal paths from X to Y, excluding X
+        causal_nodes = set(self.get_descendants(v_a)) & (set(self.get_ancestors(v_b)) | set([v_b]))
+        if len(causal_nodes) == 0:
+            return self.minimum_cost_adjustment_set(v_a, v_b)
+            
+        forbidden = set([v_a]) | causal_nodes
+        for v in causal_nodes:
+            forbidden.update(self.get_descendants(v))
+            
+        parents = set()
+        for v in causal_nodes:
+            parents.update(self.get_predecessors(v))
+        z = tuple(v for v in self.nodes() if v in parents and v not in forbidden)
+        
+        if not self.is_backdoor_set(v_a, v_b, z):
+            return None
+        return z
+    
+    def minimum_cost_adjustment_set(self, v_a, v_b, costs=None):
+        """Find a set Z of minimum total cost that satisfies the backdoor criterion between X and Y
+        
+        The set is a minimum weight vertex cut between X and Y in the moralized ancestral graph,
+        found with a single max-flow computation.
+        
+        Params:
+            v_a (str): treatment X
+            v_b (str): outcome Y
+            costs (dict of str to float): measurement cost of each variable. Missing variables
+                cost 1, so by default the set with the fewest variables is returned. Requires networkx
+                
+        Returns:
+            tuple of str, or None if no set satisfies the backdoor criterion
+        """
+        if costs is None:
+            costs = {}
+        nondescendants = self._nondescendants(v_a)
+        adjacency = self._backdoor_graph(v_a)._separation_graph(v_a, v_b, restrict=nondescendants)
+        
+        if v_b in adjacency[v_a]:
+            return None
+        
+        # Split each node into an arc (v, 'in') -> (v, 'out') whose capacity is its cost
+        nx = _import_networkx()
+        flow_graph = nx.DiGraph()
+        for v, neighbors in adjacency.items():
+            if v not in (v_a, v_b):
+                flow_graph.add_edge((v, 'in'), (v, 'out'), capacity=costs.get(v, 1))
+            for n in neighbors:
+                # Arcs without capacity are uncuttable
+                flow_graph.add_edge((v, 'out'), (n, 'in'))
+        flow_graph.add_edge((v_a, 'in'), (v_a, 'out'))
+        flow_graph.add_edge((v_b, 'in'), (v_b, 'out'))
+                
+        _, (reachable, _) = nx.minimum_cut(flow_graph, (v_a, 'out'), (v_b, 'in'))
+        z = set(v for (v, side) in reachable if side == 'in' and (v, 'out') not in reachable)
+        return tuple(v for v in self.nodes() if v in z)
+    
+    def _nondescendants(self, v):
+        """
+        Return the nodes that are neither `v` nor one of its descendants
+        """
+        descendants = set(self.get_descendants(v))
+        return [n for n in self.nodes() if n not in descendants and n != v]
+
+    def _backdoor_graph(self, v):
+        """
+        Return a copy of the graph where the arrows out of `v` have been removed
+        """
+        graph = self.copy()
+        for successor in self.get_successors(v):
+            graph.remove_edge(v, successor)
+        return graph
+
+
+def _bits(bitset):
+    """
+    Yield the positions of the bits set in `bitset`, in increasing order
+    """
+    while bitset:
+        lowest = bitset & -bitset
+        yield lowest.bit_length() - 1
+        bitset ^= lowest
+
+
+def _as_set(nodes):
+    """
+    Convert a node or a collection of nodes into a set of nodes
+    """
+    if nodes is None:
+        return set()
+    if isinstance(nodes, (list, tuple, set, frozenset)):
+        return set(nodes)
+    return set([nodes])
+
+
+def _import_networkx():
+    # networkx is only needed by a few methods, so it is not imported with the module
+    try:
+        import networkx as nx
+    except ImportError:
+        raise ImportError('This method requires networkx')
+    return nx
+
+
+def _minimal_vertex_separators(adjacency, a, b):
+    """
+    Yield the minimal sets of nodes separating `a` and `b` in an undirected graph
+    (Berry, Bordat and Cogis, 1999). Each minimal separator S is characterized by the
+    component of `a` in the graph minus S; starting from the separator closest to `a`,
+    new separators are found by growing that component by one node of S at a time.
+    
+    Params:
+        adjacency (dict of str to set of str): adjacency of the undirected graph
+        a (str): node `a`
+        b (str): node `b`
+    """
+    if b in adjacency[a]:
+        return
+    if b not in _component(adjacency, a, set()):
+        yield set()
+        return
+    
+    def close(component):
+        # Separator made of the neighbors of the component of `b` once `component`
+        # and its neighbors are removed
+        neighborhood = set(component)
+        for v in component:
+            neighborhood.update(adjacency[v])
+        component_b = _component(adjacency, b, neighborhood)
+        separator = set()
+        for v in component_b:
+            separator.update(adjacency[v])
+        return frozenset(separator - component_b)
+    
+    first = close(set([a]))
+    seen = set([first])
+    to_visit = deque([first])
+    while len(to_visit) > 0:
+        separator = to_visit.popleft()
+        yield set(separator)
+        
+        component_a = _component(adjacency, a, separator)
+        for v in separator:
+            if b in adjacency[v]:
+                continue
+            new_separator = close(component_a | set([v]))
+            if new_separator not in seen:
+                seen.add(new_separator)
+                to_visit.append(new_separator)
+
+
+def _component(adjacency, v, removed):
+    """
+    Return the connected component of `v` in an undirected graph once the nodes
+    in `removed` have been taken out
+    """
+    component = set([v])
+    to_visit = [v]
+    while len(to_visit) > 0:
+        current_node = to_visit.pop()
+        for n in adjacency[current_node]:
+            if n not in component and n not in removed:
+                component.add(n)
+                to_visit.append(n)
+    return component
 
 
 class Node():
@@ -227,28 +736,22 @@ class Path():
     
     def is_dseparated(self, z=None):
         """
-        Find if the path between x and y is d-separated given z
+        Find if the path between x and y is blocked given z: a non-collider of the path is 
+        conditioned on, or a collider of the path is not conditioned on and neither are any
+        of its descendants. The nodes are not modified, so the path can be checked concurrently.
         """
+        z = self.graph._to_bitset(_as_set(z))
         
-        # Initialize all nodes as unconditioned
-        for node in self.nodes():
-            node.uncondition()
-        
-        # Condition on the basis of z
-        if z is not None:
-            for node in self.nodes():
-                if node.label in z:
-                    node.condition()
-                    
-        # If at least one noncollider is conditioned, then d-separated
         for node in self.nodes():
-            if node.is_collider is False and node.is_conditioned is True:
+            conditioned = z >> self.graph._index[node.label] & 1
+            if node.is_collider is False and conditioned:
                 return True
             
-        # Else if there is at least one collider than has not be conditioned, then d-separated
         for node in self.nodes():
-            if node.is_collider is True and node.is_conditioned is False:
+            # A collider is opened by conditioning on itself or on one of its descendants
+            i = self.graph._index[node.label]
+            opening = self.graph._closure(1 << i, self.graph._children) | (1 << i)
+            if node.is_collider is True and not opening & z:
                 return True
             
-        # Else: return False.
-        return False
\ No newline at end of file
+        return False
@@ -1,12 +1,67 @@
-import statsmodels.api as sm
+from collections import namedtuple, OrderedDict
+import hashlib
+import math
+import pickle
+import sqlite3
+import threading
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from .statistics import SufficientStatistics
+from .regression import GramRegression, huber_regression
+
+
+IndependenceTestResult = namedtuple('IndependenceTestResult', ['independent', 'statistic', 'pvalue', 'lower', 'upper'])
+IndependenceTestResult.__doc__ = """
+Outcome of a single independence test
+
+Attributes:
+    independent (bool): whether the test concluded to independence
+    statistic (float): test statistic (e.g. the coefficient of the treatment variable)
+    pvalue (float): p-value of the test, if available
+    lower (float): lower bound of the confidence interval of the statistic, if available
+    upper (float): upper bound of the confidence interval of the statistic, if available
+"""
+
+
+def run_test(independence_test, x, y, z, data, categorical_outcome=False):
+    """
+    Run an independence test and return its result. Test objects that only implement the
+    stateful `fit`/`is_independent` interface are supported, but cannot be shared between threads.
+    """
+    if hasattr(independence_test, 'test'):
+        return independence_test.test(x, y, z, data, categorical_outcome=categorical_outcome)
+    
+    independence_test.fit(x, y, z, data=data, categorical_outcome=categorical_outcome)
+    return IndependenceTestResult(independence_test.is_independent(), None, None, None, None)
 
 
 class RobustLinearTest():
     """
-    Class that implements the Robust Linear Regression test using the Statsmodels API
+    Class that implements the Robust Linear Regression test: Huber's M-estimator fitted by 
+    iteratively reweighted least squares, as the statsmodels RLM does with its defaults.
+    Each column is converted once to a float array, and each fit starts from the weights of 
+    a robust fit of the location of its outcome, computed once per outcome. The starting point 
+    does not depend on the tests run before, so that the results do not depend on their order,
+    e.g. when the tests run on a pool of threads.
     """
-    def __init__(self, alpha=0.05):
+    # Regressing y on x and x on y give different results
+    symmetric = False
+    # The test needs the rows of the data, not only their SufficientStatistics
+    accepts_statistics = False
+    
+    def __init__(self, alpha=0.05, warm_start=True):
+        """
+        Parameters:
+            alpha (float): significance level
+            warm_start (bool): if true, start each fit from the weights of the robust fit of the location of the outcome
+        """
         self.alpha = alpha
+        self.warm_start = warm_start
+        self._data = None
+        
+    def get_params(self):
+        return {'alpha': self.alpha}
         
     def fit(self, x, y, z, data, categorical_outcome=False):
         """
@@ -14,27 +69,955 @@ class RobustLinearTest():
             x (list of str): list of treatment variables
             y (str): outcome variable
             z (str): conditioned variables
-            categorical_outcome (bool): flag the outcome variable as categorical or not
+            categorical_outcome (bool): ignored, as it was by the statsmodels RLM
         """
         self.x = x
         self.y = y
         self.z = z
         self.data = data
         
-        if categorical_outcome:
-            family = sm.families.Binomial()
-        else:
-            family = sm.families.Gaussian()
+        self.result = self.test(x, y, z, data, categorical_outcome=categorical_outcome)
+        self.coef, self.lower, self.upper = self.result.statistic, self.result.lower, self.result.upper
+        
+    def test(self, x, y, z, data, categorical_outcome=False):
+        """
+        Same as `fit`, but returns the outcome of the test instead of storing it on the object,
+        so that a single test object can be shared between concurrent workers
+        
+        Returns:
+            IndependenceTestResult
+        """
+        columns, weights = self._get_columns(data)
+        
+        exog = np.column_stack([self._get_column(columns, data, v) for v in list(x) + list(z)])
+        endog = self._get_column(columns, data, y)
+        start = self._get_start(weights, endog, y) if self.warm_start else None
+        coef, standard_error, _ = huber_regression(exog, endog, column=0, weights=start)
+        
+        quantile = NormalDist().inv_cdf(1 - self.alpha / 2)
+        lower, upper = coef - quantile * standard_error, coef + quantile * standard_error
+        pvalue = math.erfc(abs(coef / standard_error) / math.sqrt(2)) if standard_error > 0 else 0.
+        return IndependenceTestResult(_is_independent(coef, lower, upper), coef, pvalue, lower, upper)
+
+    def is_independent(self):
+        return _is_independent(self.coef, self.lower, self.upper)
+    
+    def _get_columns(self, data):
+        """
+        Return the columns of the data already converted to float arrays and the starting weights
+        of the fits of each outcome. Reset when the dataset changes.
+        """
+        if isinstance(data, SufficientStatistics):
+            raise TypeError('RobustLinearTest needs the rows of the data, use a test based on sufficient statistics instead')
             
-        self.model = sm.RLM(data[y], data[x+z], family=family).fit()
-        self.coef = self.model.params[x][0]
-        confidence_interval = self.model.conf_int(alpha=self.alpha)
-        self.lower, self.upper = confidence_interval.loc[x, 0][0], confidence_interval.loc[x, 1][0]
+        if self._data is not data:
+            self._columns = ({}, {})
+            self._data = data
+        return self._columns
+    
+    def _get_column(self, columns, data, name):
+        if name not in columns:
+            columns[name] = data[name].to_numpy(dtype=float)
+        return columns[name]
+    
+    def _get_start(self, weights, endog, name):
+        """
+        Return the weights of the robust fit of the outcome on a constant, which down-weight its outliers
+        """
+        if name not in weights:
+            weights[name] = huber_regression(np.ones((len(endog), 1)), endog, column=0)[2]
+        return weights[name]
+    
+    def __getstate__(self):
+        # The arrays and the weights are recomputed on the other side
+        state = self.__dict__.copy()
+        state['_data'] = None
+        state.pop('_columns', None)
+        state.pop('data', None)
+        return state
+    
+    
+class FisherZTest():
+    """
+    Class that implements the Fisher-z partial correlation test for Gaussian data.
+    The correlation matrix of the data is computed once; each test then only inverts
+    the small submatrix of the tested variables, without going back to the rows.
+    The data can also be given as SufficientStatistics, e.g. streamed from disk.
+    """
+    # The partial correlation of x and y is the same as that of y and x
+    symmetric = True
+    # The data can be given as SufficientStatistics
+    accepts_statistics = True
+    
+    def __init__(self, alpha=0.05):
+        self.alpha = alpha
+        self._data = None
+        
+    def get_params(self):
+        return {'alpha': self.alpha}
+        
+    def fit(self, x, y, z, data, categorical_outcome=False):
+        """
+        Attributes
+            x (list of str): list of treatment variables
+            y (str): outcome variable
+            z (str): conditioned variables
+            categorical_outcome (bool): ignored, the test assumes continuous variables
+        """
+        self.x = x
+        self.y = y
+        self.z = z
+        
+        self.result = self.test(x, y, z, data, categorical_outcome=categorical_outcome)
+        self.coef, self.lower, self.upper = self.result.statistic, self.result.lower, self.result.upper
+        
+    def test(self, x, y, z, data, categorical_outcome=False):
+        """
+        Test the partial correlation between the first treatment variable and the outcome,
+        given the conditioned variables and the other treatment variables
+        
+        Returns:
+            IndependenceTestResult, whose statistic is the partial correlation
+        """
+        correlation, index, n = self._get_correlation(data)
+        
+        variables = [index[v] for v in [x[0], y] + list(z) + list(x[1:])]
+        precision = np.linalg.pinv(correlation[np.ix_(variables, variables)])
+        partial_correlation = float(-precision[0, 1] / math.sqrt(precision[0, 0] * precision[1, 1]))
+        partial_correlation = min(max(partial_correlation, -1 + 1e-12), 1 - 1e-12)
+        
+        # Fisher transformation: atanh(r) is approximately normal with variance 1/(n - |z| - 3)
+        degrees_of_freedom = n - (len(variables) - 2) - 3
+        if degrees_of_freedom <= 0:
+            raise ValueError('Not enough observations for the number of conditioned variables')
+        standard_error = 1 / math.sqrt(degrees_of_freedom)
+        statistic = math.atanh(partial_correlation) / standard_error
+        pvalue = 2 * (1 - NormalDist().cdf(abs(statistic)))
+        
+        quantile = NormalDist().inv_cdf(1 - self.alpha / 2)
+        lower = math.tanh(math.atanh(partial_correlation) - quantile * standard_error)
+        upper = math.tanh(math.atanh(partial_correlation) + quantile * standard_error)
+        
+        return IndependenceTestResult(_is_independent(partial_correlation, lower, upper), 
+                                      partial_correlation, pvalue, lower, upper)
+    
+    def is_independent(self):
+        return _is_independent(self.coef, self.lower, self.upper)
+    
+    def _get_correlation(self, data):
+        """
+        Return the correlation matrix of the data, the position of each column in it
+        and the number of observations. Computed once per dataset.
+        """
+        if self._data is not data:
+            if isinstance(data, SufficientStatistics):
+                statistics = data
+            else:
+                statistics = SufficientStatistics.from_dataframe(data)
+            index = {column: i for i, column in enumerate(statistics.continuous_vars)}
+            self._statistics = (statistics.correlation().to_numpy(), index, statistics.n)
+            self._data = data
+        return self._statistics
+    
+    def __getstate__(self):
+        # The cached statistics are recomputed on the other side
+        state = self.__dict__.copy()
+        state['_data'] = None
+        state.pop('_statistics', None)
+        return state
+
 
+    
+class LinearRegressionTest():
+    """
+    Class that implements the t-test of the coefficient of an ordinary least squares regression.
+    The regressions are computed from the Gram matrix of the data, computed once: conditioning 
+    sets that share all but one variable reuse each other's factorisation, and batches of 
+    treatments or of conditioning sets are tested with one call.
+    """
+    # The regression of y on x is tested, not that of x on y
+    symmetric = False
+    # The data can be given as SufficientStatistics
+    accepts_statistics = True
+    
+    def __init__(self, alpha=0.05, fit_intercept=True, maxsize=10000):
+        """
+        Parameters:
+            alpha (float): significance level
+            fit_intercept (bool): if true, add an intercept to every regression
+            maxsize (int): maximum number of cached factorisations
+        """
+        self.alpha = alpha
+        self.fit_intercept = fit_intercept
+        self.maxsize = maxsize
+        self._data = None
+        
+    def get_params(self):
+        return {'alpha': self.alpha, 'fit_intercept': self.fit_intercept}
+        
+    def fit(self, x, y, z, data, categorical_outcome=False):
+        """
+        Attributes
+            x (list of str): list of treatment variables
+            y (str): outcome variable
+            z (str): conditioned variables
+            categorical_outcome (bool): ignored, the test assumes a continuous outcome
+        """
+        self.x = x
+        self.y = y
+        self.z = z
+        
+        self.result = self.test(x, y, z, data, categorical_outcome=categorical_outcome)
+        self.coef, self.lower, self.upper = self.result.statistic, self.result.lower, self.result.upper
+        
+    def test(self, x, y, z, data, categorical_outcome=False):
+        """
+        Test the coefficient of the first treatment variable in the regression of the outcome
+        on the treatment variables and the conditioned variables
+        
+        Returns:
+            IndependenceTestResult, whose statistic is the coefficient
+        """
+        regression = self._get_regression(data)
+        results = self._get_results(*regression.regress(x[:1], y, list(z) + list(x[1:])))
+        return results[0]
+    
+    def test_batch(self, x, y, z, data, categorical_outcome=False):
+        """
+        Test each treatment variable of `x` separately, given the same conditioned variables
+        
+        Returns:
+            list of IndependenceTestResult, one per treatment variable
+        """
+        regression = self._get_regression(data)
+        return self._get_results(*regression.regress(x, y, z))
+    
+    def test_sets(self, x, y, z_sets, data, categorical_outcome=False):
+        """
+        Test the first treatment variable given each of the conditioning sets in turn
+        
+        Returns:
+            list of IndependenceTestResult, one per conditioning set
+        """
+        regression = self._get_regression(data)
+        z_sets = [list(z_set) + list(x[1:]) for z_set in z_sets]
+        return self._get_results(*regression.regress_sets(x[0], y, z_sets))
+    
     def is_independent(self):
-        if self.coef > 0 and self.lower > 0:
-            return False
-        elif self.coef < 0 and self.upper < 0:
-            return False
+        return _is_independent(self.coef, self.lower, self.upper)
+    
+    def _get_results(self, coefficients, standard_errors, degrees_of_freedom):
+        from scipy import stats
+        
+        quantiles = stats.t.ppf(1 - self.alpha / 2, degrees_of_freedom)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pvalues = np.where(np.isinf(standard_errors), 1., 
+                               2 * stats.t.sf(np.abs(coefficients / standard_errors), degrees_of_freedom))
+        lowers = coefficients - quantiles * standard_errors
+        uppers = coefficients + quantiles * standard_errors
+        
+        return [IndependenceTestResult(_is_independent(coef, lower, upper), float(coef), float(pvalue), float(lower), float(upper))
+                for coef, pvalue, lower, upper in zip(coefficients, pvalues, lowers, uppers)]
+    
+    def _get_regression(self, data):
+        """
+        Return the regressions on the data. The Gram matrix is computed once per dataset.
+        """
+        if self._data is not data:
+            if isinstance(data, SufficientStatistics):
+                statistics = data
+            else:
+                statistics = SufficientStatistics.from_dataframe(data)
+            self._regression = GramRegression.from_statistics(statistics, self.fit_intercept, self.maxsize)
+            self._data = data
+        return self._regression
+    
+    def __getstate__(self):
+        # The cached statistics are recomputed on the other side
+        state = self.__dict__.copy()
+        state['_data'] = None
+        state.pop('_regression', None)
+        return state
+
+    
+class GTest():
+    """
+    Class that implements the G-test (or Pearson's chi-square test) of conditional independence 
+    between categorical variables.
+    
+    The rows are compressed once into the counts of each observed combination of values
+    (see SufficientStatistics); each test then works on the marginal counts of the tested 
+    variables, which are cached, without going back to the rows.
+    """
+    # The statistic of x and y is the same as that of y and x
+    symmetric = True
+    # The data can be given as SufficientStatistics
+    accepts_statistics = True
+    
+    def __init__(self, alpha=0.05, pearson=False):
+        """
+        Parameters:
+            alpha (float): significance level
+            pearson (bool): if true, use Pearson's chi-square statistic instead of the G statistic
+        """
+        self.alpha = alpha
+        self.pearson = pearson
+        self._data = None
+        
+    def get_params(self):
+        return {'alpha': self.alpha, 'pearson': self.pearson}
+        
+    def fit(self, x, y, z, data, categorical_outcome=False):
+        """
+        Attributes
+            x (list of str): list of treatment variables
+            y (str): outcome variable
+            z (str): conditioned variables
+            categorical_outcome (bool): ignored, all the variables are considered categorical
+        """
+        self.x = x
+        self.y = y
+        self.z = z
+        
+        self.result = self.test(x, y, z, data, categorical_outcome=categorical_outcome)
+        
+    def test(self, x, y, z, data, categorical_outcome=False):
+        """
+        Test the independence of the first treatment variable and the outcome, 
+        given the conditioned variables and the other treatment variables
+        
+        Returns:
+            IndependenceTestResult, whose statistic is the G (or chi-square) statistic
+        """
+        statistics = self._get_statistics(data)
+        
+        conditioned = list(z) + list(x[1:])
+        # Sorting the variables lets all the tests on the same variables share their count table
+        variables = sorted([x[0], y] + conditioned, key=statistics.columns.index)
+        counts = statistics.count_table(variables).rename('n').reset_index()
+        counts.columns = variables + ['n']
+        
+        if len(conditioned) > 0:
+            strata = counts.groupby(conditioned, observed=True, dropna=False)
+            n_z = strata['n'].transform('sum')
+            levels_x = strata[x[0]].transform('nunique')
+            levels_y = strata[y].transform('nunique')
+            # Each stratum contributes (|X| - 1) * (|Y| - 1) degrees of freedom
+            degrees_of_freedom = ((levels_x - 1) * (levels_y - 1) / strata['n'].transform('size')).sum()
+        else:
+            n_z = counts['n'].sum()
+            degrees_of_freedom = (counts[x[0]].nunique() - 1) * (counts[y].nunique() - 1)
+        n_xz = counts.groupby(conditioned + [x[0]], observed=True, dropna=False)['n'].transform('sum')
+        n_yz = counts.groupby(conditioned + [y], observed=True, dropna=False)['n'].transform('sum')
+        
+        observed = counts['n'].to_numpy(dtype=float)
+        expected = (n_xz * n_yz / n_z).to_numpy(dtype=float)
+        if self.pearson:
+            # Unobserved combinations contribute their expected count, and the expected counts
+            # sum to the observed counts in each stratum
+            statistic = float((observed**2 / expected).sum() - observed.sum())
         else:
-            return True
\ No newline at end of file
+            statistic = float(2 * (observed * np.log(observed / expected)).sum())
+        
+        degrees_of_freedom = int(round(degrees_of_freedom))
+        if degrees_of_freedom <= 0:
+            pvalue = 1.
+        else:
+            from scipy import stats
+            pvalue = float(stats.chi2.sf(statistic, degrees_of_freedom))
+        
+        return IndependenceTestResult(pvalue > self.alpha, statistic, pvalue, None, None)
+    
+    def is_independent(self):
+        return self.result.independent
+    
+    def _get_statistics(self, data):
+        """
+        Return the counts of each combination of values in the data. Computed once per dataset.
+        """
+        if self._data is not data:
+            if isinstance(data, SufficientStatistics):
+                self._statistics = data
+            else:
+                self._statistics = SufficientStatistics.from_dataframe(data, categorical_vars=list(data.columns))
+            self._data = data
+        return self._statistics
+    
+    def __getstate__(self):
+        # The cached statistics are recomputed on the other side
+        state = self.__dict__.copy()
+        state['_data'] = None
+        state.pop('_statistics', None)
+        return state
+    
+    
+class RandomFeatureTest():
+    """
+    Class that implements a kernel conditional independence test approximated with random
+    Fourier features (the RCoT test of Strobl, Zhang and Visweswaran), which detects non-linear
+    dependence in a time linear in the number of rows.
+    
+    x and y are each mapped to a few random features of a Gaussian kernel, and the conditioned
+    variables to more features of a product of Gaussian kernels. The features of x and y are
+    regressed on those of z by ridge regression, and the statistic is n times the squared norm
+    of the cross-covariance of the residuals. Its null distribution, a weighted sum of chi-squares,
+    is approximated by the gamma distribution with the same mean and variance.
+    
+    The random frequencies of each variable are drawn from the seed and the name of the variable,
+    and its features computed once per dataset, so that all the tests reuse them. The features of
+    the most recent conditioning sets are kept as well.
+    """
+    # The statistic of x and y is the same as that of y and x
+    symmetric = True
+    # The test needs the rows of the data, not only their SufficientStatistics
+    accepts_statistics = False
+    # Number of rows drawn at random to compute the median distance between values
+    BANDWIDTH_ROWS = 500
+    
+    def __init__(self, alpha=0.05, n_features=5, n_conditioning_features=100, ridge=1e-10, maxsize=16, seed=0):
+        """
+        Parameters:
+            alpha (float): significance level
+            n_features (int): number of random features of x and of y
+            n_conditioning_features (int): number of random features of the conditioned variables
+            ridge (float): penalty of the regressions on the features of the conditioned variables
+            maxsize (int): number of conditioning sets whose features are kept, each taking 
+                n_conditioning_features floats per row
+            seed (int): seed of the random features
+        """
+        self.alpha = alpha
+        self.n_features = n_features
+        self.n_conditioning_features = n_conditioning_features
+        self.ridge = ridge
+        self.maxsize = maxsize
+        self.seed = seed
+        self._initialize_state()
+        
+    def _initialize_state(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._columns = {}
+        self._features = {}
+        self._conditioning_features = OrderedDict()
+        
+    def get_params(self):
+        return {'alpha': self.alpha, 'n_features': self.n_features, 
+                'n_conditioning_features': self.n_conditioning_features, 'ridge': self.ridge, 'seed': self.seed}
+        
+    def fit(self, x, y, z, data, categorical_outcome=False):
+        """
+        Attributes
+            x (list of str): list of treatment variables
+            y (str): outcome variable
+            z (str): conditioned variables
+            categorical_outcome (bool): ignored, the variables are considered numerical
+        """
+        self.x = x
+        self.y = y
+        self.z = z
+        
+        self.result = self.test(x, y, z, data, categorical_outcome=categorical_outcome)
+        
+    def test(self, x, y, z, data, categorical_outcome=False):
+        """
+        Test the independence of the first treatment variable and the outcome, 
+        given the conditioned variables and the other treatment variables
+        
+        Returns:
+            IndependenceTestResult, whose statistic is n times the squared norm of the cross-covariance
+        """
+        self._reset(data)
+        conditioned = list(z) + list(x[1:])
+        n = len(data)
+        
+        # Step 1: Features of x and y, without what the conditioned variables explain of them
+        features = np.hstack([self._get_features(data, x[0]), self._get_features(data, y)])
+        if len(conditioned) > 0:
+            features_z, inverse = self._get_conditioning_features(data, conditioned)
+            features = features - features_z @ (inverse @ (features_z.T @ features))
+        residuals_x, residuals_y = features[:, :self.n_features], features[:, self.n_features:]
+        
+        # Step 2: Statistic, from the cross-covariance of the residuals
+        products = (residuals_x[:, :, None] * residuals_y[:, None, :]).reshape(n, -1)
+        statistic = float(n * np.sum(products.mean(axis=0)**2))
+        
+        # Step 3: Gamma distribution with the mean and variance of the null distribution,
+        # sum of chi-squares weighted by the eigenvalues of the covariance of the products
+        covariance = products.T @ products / n
+        mean, variance = np.trace(covariance), 2 * np.sum(covariance**2)
+        if mean <= 0:
+            pvalue = 1.
+        else:
+            from scipy import stats
+            pvalue = float(stats.gamma.sf(statistic, mean**2 / variance, scale=variance / mean))
+        
+        return IndependenceTestResult(pvalue > self.alpha, statistic, pvalue, None, None)
+    
+    def is_independent(self):
+        return self.result.independent
+    
+    def _reset(self, data):
+        """
+        Drop the columns and features when the dataset changes
+        """
+        if isinstance(data, SufficientStatistics):
+            raise TypeError('RandomFeatureTest needs the rows of the data, use a test based on sufficient statistics instead')
+            
+        with self._lock:
+            if self._data is not data:
+                self._columns = {}
+                self._features = {}
+                self._conditioning_features = OrderedDict()
+                self._data = data
+        
+    def _get_column(self, data, name):
+        """
+        Return the standardized column divided by its bandwidth, the median distance between its values.
+        The distances are computed on rows drawn at random, as the first rows may not be representative
+        (e.g. with sorted data)
+        """
+        if name not in self._columns:
+            column = data[name].to_numpy(dtype=float)
+            std = column.std()
+            column = (column - column.mean()) / (std if std > 0 else 1.)
+            rows = self._get_rng(name, 2).choice(len(column), min(len(column), self.BANDWIDTH_ROWS), replace=False)
+            sample = column[rows]
+            bandwidth = np.median(np.abs(sample[:, None] - sample[None, :])[np.triu_indices(len(sample), 1)]) if len(sample) > 1 else 0.
+            self._columns[name] = column / (bandwidth if bandwidth > 0 else 1.)
+        return self._columns[name]
+    
+    def _get_frequencies(self, name, size, stream):
+        """
+        Random frequencies and phases of a variable, the same in every process
+        """
+        rng = self._get_rng(name, stream)
+        return rng.normal(size=size), rng.uniform(0, 2 * np.pi, size=size)
+    
+    def _get_rng(self, name, stream):
+        """
+        Random generator given by the seed, the name of a variable and the use of the draws
+        """
+        key = int.from_bytes(hashlib.sha1(str(name).encode()).digest()[:8], 'little')
+        return np.random.default_rng([self.seed, key, stream])
+    
+    def _get_features(self, data, name):
+        """
+        Return the centered random features of a variable
+        """
+        if name not in self._features:
+            frequencies, phases = self._get_frequencies(name, self.n_features, 0)
+            features = math.sqrt(2 / self.n_features) * np.cos(self._get_column(data, name)[:, None] * frequencies + phases)
+            self._features[name] = features - features.mean(axis=0)
+        return self._features[name]
+    
+    def _get_conditioning_features(self, data, conditioned):
+        """
+        Return the centered random features of the conditioned variables, and the inverse of their 
+        penalized Gram matrix. The features of a product of Gaussian kernels project the variables on 
+        frequencies drawn independently for each variable, so the frequencies of each are reused.
+        """
+        key = tuple(sorted(set(conditioned), key=str))
+        with self._lock:
+            if key in self._conditioning_features:
+                self._conditioning_features.move_to_end(key)
+                return self._conditioning_features[key]
+        
+        _, phases = self._get_frequencies(None, self.n_conditioning_features, 1)
+        projection = np.zeros((len(data), self.n_conditioning_features))
+        for name in key:
+            projection += np.outer(self._get_column(data, name), self._get_frequencies(name, self.n_conditioning_features, 1)[0])
+        features = math.sqrt(2 / self.n_conditioning_features) * np.cos(projection + phases)
+        features -= features.mean(axis=0)
+        gram = features.T @ features + self.ridge * np.eye(self.n_conditioning_features)
+        result = (features, np.linalg.pinv(gram, hermitian=True))
+        
+        with self._lock:
+            self._conditioning_features[key] = result
+            while len(self._conditioning_features) > self.maxsize:
+                self._conditioning_features.popitem(last=False)
+        return result
+    
+    def __getstate__(self):
+        # The features are computed again on the other side
+        state = self.__dict__.copy()
+        for attribute in ['_lock', '_data', '_columns', '_features', '_conditioning_features']:
+            state.pop(attribute, None)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._initialize_state()
+    
+    
+class CachedIndependenceTest():
+    """
+    Wrapper around an independence test that memoizes its results, so that the same
+    question asked twice, e.g. (a, b | Z) then (b, a | Z) or on a rerun, is only tested once.
+    
+    Results are keyed on the tested variables, the set of conditioned variables, the parameters
+    of the test and a fingerprint of the data. The most recent results are kept in memory, and
+    all of them can also be stored on disk, to be reused by later runs on the same data.
+    
+    Attributes:
+        hits (int): number of results found in the cache
+        misses (int): number of results that had to be computed
+    """
+    def __init__(self, independence_test, maxsize=100000, path=None, symmetric=None):
+        """
+        Parameters:
+            independence_test (test object): test to wrap. It must implement `test`
+            maxsize (int): maximum number of results kept in memory (least recently used first out)
+            path (str): path of a SQLite file where results are stored. Default is memory only
+            symmetric (bool): if true, (x, y | Z) and (y, x | Z) are considered the same test. 
+                Default is given by the `symmetric` attribute of the wrapped test
+        """
+        self.independence_test = independence_test
+        self.maxsize = maxsize
+        self.path = path
+        self.accepts_statistics = getattr(independence_test, 'accepts_statistics', False)
+        if symmetric is None:
+            self.symmetric = getattr(independence_test, 'symmetric', False)
+        else:
+            self.symmetric = symmetric
+        self.hits = 0
+        self.misses = 0
+        self._initialize_state()
+        
+    def _initialize_state(self):
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pending_writes = 0
+        self._data = None
+        self._fingerprint = None
+        
+    def get_params(self):
+        return self.independence_test.get_params()
+        
+    @property
+    def hit_rate(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        if hits + misses == 0:
+            return 0.
+        return hits / (hits + misses)
+        
+    def fit(self, x, y, z, data, categorical_outcome=False):
+        self.result = self.test(x, y, z, data, categorical_outcome=categorical_outcome)
+        
+    def is_independent(self):
+        return self.result.independent
+        
+    def test(self, x, y, z, data, categorical_outcome=False):
+        """
+        Return the result of the wrapped test, computing it only if it is not in the cache
+        
+        Returns:
+            IndependenceTestResult
+        """
+        key = self._get_key(x, y, z, data, categorical_outcome)
+        
+        # The counters are updated with the lookup, under the same lock, so that
+        # concurrent calls from a thread pool do not lose increments
+        result = self._get(key)
+        if result is not None:
+            return result
+        
+        result = self.independence_test.test(x, y, z, data, categorical_outcome=categorical_outcome)
+        self._set(key, result)
+        return result
+    
+    def close(self):
+        """
+        Write the pending results to disk and close the file
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.commit()
+                self._connection.close()
+                self._connection = None
+                self._pending_writes = 0
+                
+    def _get_key(self, x, y, z, data, categorical_outcome):
+        """
+        Canonical key of a test: the variables are ordered (unless the test is symmetric),
+        but the order of the conditioned variables does not matter
+        """
+        with self._lock:
+            if self._data is not data:
+                self._data, self._fingerprint = data, _fingerprint(data)
+            fingerprint = self._fingerprint
+        
+        pair = (x[0], y)
+        if self.symmetric:
+            pair = tuple(sorted(pair, key=repr))
+            categorical_outcome = None
+        key = (type(self.independence_test).__name__, sorted(self.get_params().items()), fingerprint,
+               pair, sorted(x[1:], key=repr), sorted(z, key=repr), categorical_outcome)
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+    
+    def _get(self, key):
+        """
+        Look up a result in memory, then on disk, and count the hit or the miss
+        """
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            
+            if self.path is not None:
+                row = self._get_connection().execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    result = pickle.loads(row[0])
+                    self._remember(key, result)
+                    self.hits += 1
+                    return result
+            
+            self.misses += 1
+        return None
+    
+    def _set(self, key, result):
+        with self._lock:
+            self._remember(key, result)
+            
+            if self.path is not None:
+                self._get_connection().execute('INSERT OR REPLACE INTO results VALUES (?, ?)', 
+                                               (key, pickle.dumps(result)))
+                self._pending_writes += 1
+                if self._pending_writes >= 256:
+                    self._connection.commit()
+                    self._pending_writes = 0
+                    
+    def _remember(self, key, result):
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+    
+    def _get_connection(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB)')
+        return self._connection
+    
+    def __getstate__(self):
+        # Locks and connections cannot be sent to another process: each worker
+        # starts with an empty memory cache and opens the file on its own
+        self.close()
+        state = self.__dict__.copy()
+        for attribute in ['_cache', '_lock', '_connection', '_pending_writes', '_data', '_fingerprint']:
+            del state[attribute]
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._initialize_state()
+        
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+        
+        
+class SequentialTest():
+    """
+    Wrapper around an independence test that first runs it on a random subsample of the rows,
+    and only grows the subsample (geometrically, up to all the rows) while dependence has not
+    been shown. Clear dependencies are then decided on a small share of the data.
+    
+    Each stage is tested at a share of the significance level given by an alpha-spending function
+    of the share of the rows used, so that the chance of wrongly rejecting independence over 
+    all the stages stays below `alpha`. The subsamples are nested, and drawn once per dataset.
+    Each stage size has its own copy of the wrapped test, so that the statistics it caches for 
+    its subsample (e.g. a correlation or Gram matrix) are reused by all the tests at that stage.
+    The stage on all the rows uses the wrapped test itself.
+    
+    A test that is never stopped early reads the rows of every stage: in total up to 
+    growth / (growth - 1) times the number of rows, e.g. 1.33 times with the default growth.
+    
+    Attributes:
+        n_tests (int): number of tests run
+        rows_tested (int): total number of rows used by the stages of all the tests
+    """
+    def __init__(self, independence_test, initial_size=10000, growth=4, spending='obrien_fleming', 
+                 alpha=None, futility_margin=None, seed=0):
+        """
+        Parameters:
+            independence_test (test object): test to wrap. Its results must have p-values
+            initial_size (int): number of rows of the first stage
+            growth (float): ratio between the numbers of rows of consecutive stages
+            spending (str): how the significance level is shared between the stages
+                'obrien_fleming' (default): little at the first stages, most of it on all the rows
+                'pocock': more evenly between the stages
+                'bonferroni': equally between the stages
+            alpha (float): overall significance level. Default is the `alpha` of the wrapped test
+            futility_margin (float): if given, also stop and conclude independence as soon as the 
+                confidence interval of a stage lies within (-futility_margin, futility_margin)
+            seed (int): seed of the subsamples
+        """
+        if spending not in ('obrien_fleming', 'pocock', 'bonferroni'):
+            raise ValueError('Wrong input: `spending` expects "obrien_fleming", "pocock" or "bonferroni"')
+        if growth <= 1:
+            raise ValueError('Wrong input: `growth` expects a number greater than 1')
+            
+        self.independence_test = independence_test
+        self.initial_size = initial_size
+        self.growth = growth
+        self.spending = spending
+        self.alpha = getattr(independence_test, 'alpha', 0.05) if alpha is None else alpha
+        self.futility_margin = futility_margin
+        self.seed = seed
+        self.symmetric = getattr(independence_test, 'symmetric', False)
+        self.n_tests = 0
+        self.rows_tested = 0
+        self._initialize_state()
+        
+    def _initialize_state(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._samples = {}
+        self._tests = {}
+        
+    def get_params(self):
+        params = dict(self.independence_test.get_params(), alpha=self.alpha)
+        params.update(initial_size=self.initial_size, growth=self.growth, spending=self.spending, 
+                      futility_margin=self.futility_margin, seed=self.seed)
+        return params
+    
+    @property
+    def mean_rows(self):
+        """
+        Average number of rows used per test
+        """
+        if self.n_tests == 0:
+            return 0.
+        return self.rows_tested / self.n_tests
+        
+    def fit(self, x, y, z, data, categorical_outcome=False):
+        self.result = self.test(x, y, z, data, categorical_outcome=categorical_outcome)
+        
+    def is_independent(self):
+        return self.result.independent
+    
+    def test(self, x, y, z, data, categorical_outcome=False):
+        """
+        Run the stages of the test until one of them decides
+        
+        Returns:
+            IndependenceTestResult of the last stage run, with the decision of the sequential test
+        """
+        self.n_tests += 1
+        if isinstance(data, SufficientStatistics):
+            # The rows are not available: a single stage on all the data
+            self.rows_tested += data.n
+            return run_test(self.independence_test, x, y, z, data, categorical_outcome)
+        
+        sizes = self._get_sizes(len(data))
+        spent_alpha = 0.
+        for stage, size in enumerate(sizes):
+            sample = self._get_sample(data, size)
+            result = run_test(self._get_test(data, size), x, y, z, sample, categorical_outcome)
+            self.rows_tested += size
+            if result.pvalue is None:
+                raise ValueError('Wrong input: SequentialTest needs a test whose results have p-values')
+            
+            # Significance level of this stage: what the spending function allows beyond the previous stages
+            allowed_alpha = self._spend(size / len(data), stage + 1, len(sizes))
+            stage_alpha, spent_alpha = allowed_alpha - spent_alpha, allowed_alpha
+            
+            if result.pvalue <= stage_alpha:
+                return result._replace(independent=False)
+            if stage == len(sizes) - 1:
+                return result._replace(independent=True)
+            if (self.futility_margin is not None and result.lower is not None 
+                    and -self.futility_margin < result.lower and result.upper < self.futility_margin):
+                return result._replace(independent=True)
+    
+    def _get_sizes(self, n):
+        """
+        Number of rows of each stage, the last one being all the rows
+        """
+        sizes = []
+        size = self.initial_size
+        while size < n:
+            sizes.append(int(size))
+            size *= self.growth
+        return sizes + [n]
+    
+    def _spend(self, share, stage, n_stages):
+        """
+        Share of `alpha` that can be spent once `share` of the rows, or `stage` of the stages, are used
+        """
+        if self.spending == 'obrien_fleming':
+            quantile = NormalDist().inv_cdf(1 - self.alpha / 2)
+            # Two-sided tail of the normal, computed without the cancellation of 1 - cdf
+            return math.erfc(quantile / math.sqrt(share) / math.sqrt(2))
+        if self.spending == 'pocock':
+            return self.alpha * math.log(1 + (math.e - 1) * share)
+        return self.alpha * stage / n_stages
+    
+    def _get_sample(self, data, size):
+        """
+        Return the first `size` rows of a random permutation of the data, in their original order.
+        The samples are kept, so that the wrapped test can reuse what it computed on them.
+        """
+        if size == len(data):
+            return data
+        with self._lock:
+            if self._data is not data:
+                self._permutation = np.random.default_rng(self.seed).permutation(len(data))
+                self._samples = {}
+                self._data = data
+            if size not in self._samples:
+                self._samples[size] = data.iloc[np.sort(self._permutation[:size])]
+            return self._samples[size]
+    
+    def _get_test(self, data, size):
+        """
+        Return the copy of the wrapped test that runs the stages with `size` rows
+        """
+        if size == len(data):
+            return self.independence_test
+        with self._lock:
+            if size not in self._tests:
+                # Pickling leaves out the caches and recreates the locks of the test
+                self._tests[size] = pickle.loads(pickle.dumps(self.independence_test))
+            return self._tests[size]
+        
+    def __getstate__(self):
+        # The samples are drawn again on the other side
+        state = self.__dict__.copy()
+        for attribute in ['_lock', '_data', '_samples', '_permutation', '_tests']:
+            state.pop(attribute, None)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._initialize_state()
+    
+
+def _fingerprint(data):
+    """
+    Hash of the content of a dataset
+    """
+    if isinstance(data, SufficientStatistics):
+        return data.fingerprint()
+    if isinstance(data, pd.DataFrame):
+        digest = hashlib.sha1(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+        digest.update(repr((list(data.columns), [str(t) for t in data.dtypes])).encode())
+        return digest.hexdigest()
+    return hashlib.sha1(pickle.dumps(data)).hexdigest()
+
+
+def _is_independent(coef, lower, upper):
+    """
+    Independence holds unless the confidence interval of the coefficient excludes zero
+    """
+    if coef > 0 and lower > 0:
+        return False
+    elif coef < 0 and upper < 0:
+        return False
+    else:
+        return True
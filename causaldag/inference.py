@@ -1,45 +1,199 @@
+import itertools
+import time
+from collections import deque
 from .graphs import Graph
 from .utils import get_all_possible_sets
+from .executors import SerialExecutor, timed_test
+from .instrumentation import Instrumentation
 
 class IC_star():
     """
     Implements the IC* (inductive causation) inference algorithm
     """
-    def __init__(self, data, independence_test, categorical_vars=None):
+    def __init__(self, data, independence_test, categorical_vars=None, executor=None, 
+                 skeleton='complete', max_depth=None, instrumentation=None, infer=True):
         """
         Parameters:
-            data (pandas.DataFrame): data to infer a causal diagram from
+            data (pandas.DataFrame or SufficientStatistics): data to infer a causal diagram from
             independence_test (test object): method for testing independence between variables
             categorical_vars (list of str): list of categorical variables
+            executor (executor object): how to run the independence tests, e.g. on a pool of 
+                processes (see causaldag.executors). Default runs them serially
+            skeleton (str): how to search for the conditioning sets that remove edges
+                'complete' (default): for each edge, try every subset of the other nodes
+                'pc_stable': level by level, as in the PC-stable algorithm. At level q, try 
+                    the subsets of size q of the nodes adjacent to either end of the edge
+                    at the start of the level. The number of tests is then bounded by the 
+                    sparsity of the graph, and the adjacencies do not depend on the order of the nodes.
+                    The conditioning sets are the first ones found, which does depend on that order,
+                    and so may the orientations of the edges
+            max_depth (int): maximum size of the conditioning sets. Default is no limit
+            instrumentation (Instrumentation object): collects timings and counters of the run 
+                and reports progress (see causaldag.instrumentation). A new one is created by default
+            infer (bool): if true (default), run the inference immediately. Else call `infer()` 
+                later, e.g. once `instrumentation` has been set up
         """
+        if skeleton not in ('complete', 'pc_stable'):
+            raise ValueError('Wrong input: `skeleton` expects "complete" or "pc_stable"')
+        
         self.data = data
         self.independence_test = independence_test
+        if executor is None:
+            self.executor = SerialExecutor()
+        else:
+            self.executor = executor
         self.nodes = list(data.columns)
         if categorical_vars is None:
             self.categorical_vars = []
         else:
             self.categorical_vars = categorical_vars
+        self.skeleton = skeleton
+        self.max_depth = max_depth
+        if instrumentation is None:
+            self.instrumentation = Instrumentation()
+        else:
+            self.instrumentation = instrumentation
         self.graph = None
         self.conditioning_sets = {}
-        self.infer()
+        self.weakest_tests = {}
+        if infer:
+            self.infer()
         
     def infer(self):
         """
         Inference algorithm
         """
+        self.instrumentation.watch_cache(self.independence_test)
+        self.conditioning_sets = {}
+        self.weakest_tests = {}
+        
         # Step 1: Initialize a fully-connected undirect graph
         self._initialize_graph()
         # Step 2: Find all conditioning sets
-        self._find_conditioning_sets()
+        with self.instrumentation.phase_timer('skeleton'):
+            if self.skeleton == 'pc_stable':
+                self._find_conditioning_sets_by_level()
+            else:
+                self._find_conditioning_sets()
         # Step 3: Among non-adjacent sets, find if a given common neighbor has 
-        self._find_colliders()
+        with self.instrumentation.phase_timer('colliders'):
+            self._find_colliders()
         # Step 4: Apply recursion rules
-        recursion_ongoing = True
-        while recursion_ongoing is True:
-            recursion_rule_1_ongoing = self._recursion_rule_1()
-            recursion_rule_2_ongoing = self._recursion_rule_2()
-            recursion_ongoing = recursion_rule_1_ongoing or recursion_rule_2_ongoing
+        with self.instrumentation.phase_timer('recursion'):
+            self._apply_recursion_rules()
             
+    def update(self, data):
+        """
+        Update the inferred graph with new data, e.g. with rows appended or new variables,
+        retesting only the decisions that the new data could change:
+            - an edge removed by a conditioning set stays removed if the set still makes its 
+              ends independent. Else the search of its conditioning set is run again
+            - an edge kept is removed if its weakest test (the one with the highest p-value) 
+              now finds independence
+            - the edges of the new variables are searched, and the edges kept are tested 
+              with the conditioning sets that include new variables
+        The orientations are then propagated again from the updated skeleton.
+        
+        Parameters:
+            data (pandas.DataFrame or SufficientStatistics): the whole updated data, e.g. 
+                the old and the new rows, with the same variables as before and possibly new ones
+        """
+        if self.graph is None:
+            self.data = data
+            self.nodes = list(data.columns)
+            self.infer()
+            return
+        
+        missing_nodes = [v for v in self.nodes if v not in data.columns]
+        if len(missing_nodes) > 0:
+            raise ValueError('Wrong input: the data lacks the variables {}'.format(missing_nodes))
+        new_nodes = [v for v in data.columns if v not in self.nodes]
+        
+        self.data = data
+        self.nodes = self.nodes + new_nodes
+        self.instrumentation.watch_cache(self.independence_test)
+        
+        with self.instrumentation.phase_timer('skeleton'):
+            kept_edges = list(self.graph.edges())
+            # Step 1: Restart from the skeleton, with the new nodes adjacent to all the others
+            self.graph = Graph()
+            for v in self.nodes:
+                self.graph.add_node(v)
+            for (v_a, v_b) in kept_edges:
+                self.graph.add_edge(v_a, v_b)
+            for v_a in new_nodes:
+                for v_b in self.nodes:
+                    if v_b != v_a:
+                        self.graph.add_edge(v_a, v_b)
+            
+            # Step 2: Retest the removed edges and the weakest test of the kept edges
+            restored_edges = self._retest_edges(kept_edges)
+            
+            # Step 3: Search again the restored edges and the edges of the new nodes
+            edges = restored_edges + [(v_a, v_b) for (v_a, v_b) in self.graph.edges() 
+                                      if v_a in new_nodes or v_b in new_nodes]
+            if self.skeleton == 'pc_stable':
+                self._find_conditioning_sets_by_level(edges)
+            else:
+                tasks = [(v_a, v_b, self._get_conditioning_nodes(v_a, v_b), 
+                          v_b in self.categorical_vars, self.max_depth) for (v_a, v_b) in edges]
+                self._search_edges(_find_conditioning_set, edges, tasks)
+            
+            # Step 4: Test the kept edges with the conditioning sets that include new nodes
+            if len(new_nodes) > 0:
+                edges = [edge for edge in kept_edges if edge not in self.conditioning_sets]
+                tasks = [(v_a, v_b, self._get_conditioning_nodes(v_a, v_b), new_nodes,
+                          v_b in self.categorical_vars, self.max_depth) for (v_a, v_b) in edges]
+                self._search_edges(_find_conditioning_set_including, edges, tasks)
+            
+        with self.instrumentation.phase_timer('colliders'):
+            self._find_colliders()
+        with self.instrumentation.phase_timer('recursion'):
+            self._apply_recursion_rules()
+        
+    def _retest_edges(self, kept_edges):
+        """
+        Retest the conditioning sets of the removed edges and the weakest tests of the `kept_edges`,
+        and update the graph accordingly
+        
+        Returns:
+            list of the removed edges whose conditioning set does not make their ends independent anymore
+        """
+        edges = list(self.conditioning_sets.items()) + [(edge, self.weakest_tests[edge][0]) for edge in kept_edges 
+                                                        if self.weakest_tests.get(edge, (None, None))[0] is not None]
+        tasks = [(v_a, v_b, z_set, v_b in self.categorical_vars) for ((v_a, v_b), z_set) in edges]
+        
+        def on_result(i, result):
+            (_, latency) = result
+            self.instrumentation.record_tests([latency])
+            self.instrumentation.progress(edges_done=i+1, edges_total=len(tasks), retest=True)
+            
+        results = self.executor.map(_retest_edge, tasks, self.data, callback=on_result, 
+                                    context=self.independence_test)
+        
+        restored_edges = []
+        for ((v_a, v_b), z_set), (result, _) in zip(edges, results):
+            self.weakest_tests[v_a, v_b] = (z_set, result.pvalue)
+            if (v_a, v_b) in self.conditioning_sets and not result.independent:
+                del self.conditioning_sets[v_a, v_b]
+                restored_edges.append((v_a, v_b))
+            elif (v_a, v_b) not in self.conditioning_sets and result.independent:
+                self.conditioning_sets[v_a, v_b] = z_set
+                self.graph.remove_edge(v_a, v_b)
+                
+        for (v_a, v_b) in restored_edges:
+            self.graph.add_edge(v_a, v_b)
+        return restored_edges
+    
+    def _get_conditioning_nodes(self, v_a, v_b):
+        """
+        Nodes that can be conditioned on when searching the conditioning set of an edge:
+        all the other nodes, or with the PC-stable search, the nodes adjacent to either end
+        """
+        if self.skeleton == 'pc_stable':
+            neighbors = set(self.graph.get_neighbors(v_a)) | set(self.graph.get_neighbors(v_b))
+            return [n for n in self.graph.nodes() if n in neighbors and n not in [v_a, v_b]]
+        return [n for n in self.graph.nodes() if n not in [v_a, v_b]]
         
     def _initialize_graph(self):
         """
@@ -56,47 +210,80 @@ class IC_star():
         For each edge in the initialized self.graph, find progressively larger conditioning sets
         until we find a set that d-separates the edge. If we find such a set, remove the edge.
         Else continue. Store findings in self.conditioning_sets
+        
+        The search for each edge is independent from the others, so the edges are handed 
+        to the executor, which may process them concurrently.
         """
         edges = list(self.graph.edges())
+        tasks = []
         for (v_a, v_b) in edges:
             
-            if v_b in self.categorical_vars:
-                categorical_outcome=True
-            else:
-                categorical_outcome=False
-            
             # Nodes that can be conditioned on
             conditioning_nodes = [n for n in self.graph.nodes() if n not in [v_a, v_b]]
-            cn_max = len(conditioning_nodes)
             
-            for v in conditioning_nodes: # Check Can clear
-                assert v not in [v_a, v_b]
+            tasks.append((v_a, v_b, conditioning_nodes, 
+                          v_b in self.categorical_vars, self.max_depth))
             
-            # Going from 1-node to set to larger sets
-            found = False
-            for q in range(1, cn_max+1):
-                
-                # Iterate for each set:
-                
-                for z_set in get_all_possible_sets(conditioning_nodes, q):
-                    
-                    
-                    self.independence_test.fit(x = [v_a], y = v_b, z = list(z_set), categorical_outcome=categorical_outcome, data = self.data)
-                    
-                    if self.independence_test.is_independent():
-                        # Update self.conditioning_sets
-                        self.conditioning_sets[v_a, v_b] = z_set
-                        # Remove the edge
-                        self.graph.remove_edge(v_a, v_b)
-                        # Break through the whole loop
-                        found = True
-                        break
-                
-                if found is True:
-                    break
+        self._search_edges(_find_conditioning_set, edges, tasks)
+        
+    def _find_conditioning_sets_by_level(self, edges=None):
+        """
+        PC-stable search of the conditioning sets. At each level q, the adjacencies of all the 
+        nodes are frozen, then for each remaining edge the subsets of size q of the adjacencies
+        of its ends are tested. Edges whose ends have fewer than q other neighbors are final.
+        
+        Parameters:
+            edges (list of tuples): if given, only search the conditioning sets of these edges
+        """
+        if edges is not None:
+            edges = set(edges)
+        depth = 0
+        while self.max_depth is None or depth <= self.max_depth:
+            adjacencies = {v: list(self.graph.get_neighbors(v)) for v in self.graph.nodes()}
+            
+            level_edges = []
+            tasks = []
+            for (v_a, v_b) in list(self.graph.edges()):
+                if edges is not None and (v_a, v_b) not in edges:
+                    continue
+                neighbors_a = [n for n in adjacencies[v_a] if n != v_b]
+                neighbors_b = [n for n in adjacencies[v_b] if n != v_a]
+                if len(neighbors_a) < depth and len(neighbors_b) < depth:
+                    continue
+                level_edges.append((v_a, v_b))
+                tasks.append((v_a, v_b, neighbors_a, neighbors_b, depth,
+                              v_b in self.categorical_vars))
             
+            if len(level_edges) == 0:
+                break
             
+            self._search_edges(_find_conditioning_set_at_depth, level_edges, tasks, depth=depth)
+            depth += 1
             
+    def _search_edges(self, function, edges, tasks, **info):
+        """
+        Hand the search of the conditioning sets of the edges to the executor, 
+        and remove the edges for which a conditioning set was found
+        """
+        def on_result(i, result):
+            (_, latencies, _) = result
+            self.instrumentation.record_tests(latencies)
+            self.instrumentation.progress(edges_done=i+1, edges_total=len(tasks), **info)
+            
+        results = self.executor.map(function, tasks, self.data, callback=on_result, 
+                                    context=self.independence_test)
+        
+        for (v_a, v_b), (z_set, _, weakest_test) in zip(edges, results):
+            # Keep the test that was the closest to removing the edge, to retest it on new data
+            if z_set is not None or (v_a, v_b) not in self.weakest_tests:
+                self.weakest_tests[v_a, v_b] = weakest_test
+            elif weakest_test[0] is not None:
+                self.weakest_tests[v_a, v_b] = _weakest_test(self.weakest_tests[v_a, v_b], *weakest_test)
+            if z_set is not None:
+                # Update self.conditioning_sets
+                self.conditioning_sets[v_a, v_b] = z_set
+                # Remove the edge
+                self.graph.remove_edge(v_a, v_b)
         
     def _find_colliders(self):
         """
@@ -129,80 +316,217 @@ class IC_star():
                         self.graph.set_edge_orientation(nonadjacent, neighbor)
                         #print('Found collider: {} -> {} <- {}'.format(node, neighbor, nonadjacent))
     
-    def _recursion_rule_1(self):
+    def _apply_recursion_rules(self):
         """
-        Apply recursion rule 1.
-        Find set of nonadjacent nodes (a, b) for which the neighbor c has an arrow from a into c 
-        and no arrow from b into c. Mark that edge from b to c as directed towards b.
+        Orient as many of the remaining undirected edges as possible with the recursion rules.
+        
+        Rather than rescanning the whole graph until nothing changes, every oriented edge is put
+        on a worklist, and only the configurations around it are checked again when it is processed.
+        The directed reachability between nodes is maintained as edges get oriented, 
+        so that rule 2 does not need to enumerate paths.
         """
-        arrow_added = False
-        # For each node
-        for node in self.graph.nodes():
+        # Nodes reachable from each node through a directed path
+        self._reachable = {v: set() for v in self.graph.nodes()}
+        
+        to_visit = deque()
+        for (v_a, v_b) in self.graph.edges():
+            orientation = self.graph.get_edge_orientation(v_a, v_b)
+            if orientation == v_b:
+                to_visit.append((v_a, v_b))
+            elif orientation == v_a:
+                to_visit.append((v_b, v_a))
+                
+        while len(to_visit) > 0:
+            (v_a, v_b) = to_visit.popleft()
             
-            # Find the neighbors
-            neighbors = self.graph.get_neighbors(node)
+            new_arrows = self._recursion_rule_1(v_a, v_b) + self._recursion_rule_3(v_a, v_b)
+            new_arrows += self._recursion_rule_2(self._add_reachability(v_a, v_b))
             
-            # For each of these neighbor:
-            for neighbor in neighbors:
-                
-                if self.graph.get_edge_orientation(node,neighbor) != neighbor:
-                    # If the edge from a to c is not pointing to c, skip
-                    continue
-                
-                # Get its own neighbors
-                neighbor_neighbors = [v for v in self.graph.get_neighbors(neighbor) 
-                                      if v != node and v not in neighbors]
-                
-                if len(neighbor_neighbors) == 0:
-                    # If no nonadjacent then skip
-                    continue
-                
-                for nonadjacent in neighbor_neighbors:
-                    if self.graph.get_edge_orientation(nonadjacent,neighbor) is None:
-                        self.graph.set_edge_orientation(neighbor, nonadjacent)
-                        arrow_added = True
-                        
-        return arrow_added
+            for (source, target) in new_arrows:
+                if self.graph.get_edge_orientation(source, target) is None:
+                    self.graph.set_edge_orientation(source, target)
+                    to_visit.append((source, target))
+    
+    def _get_undirected_neighbors(self, v):
+        return [n for n in self.graph.get_neighbors(v) if self.graph.get_edge_orientation(v, n) is None]
     
-    def _recursion_rule_2(self):
+    def _recursion_rule_1(self, v_a, v_c):
         """
+        Apply recursion rule 1 around the arrow a -> c.
+        For every neighbor b of c nonadjacent to a, with no arrow between b and c, 
+        mark that edge as directed from c to b.
+        """
+        neighbors = self.graph.get_neighbors(v_a)
+        return [(v_c, v_b) for v_b in self._get_undirected_neighbors(v_c) 
+                if v_b != v_a and v_b not in neighbors]
+    
+    def _recursion_rule_2(self, nodes):
+        """
+        Apply recursion rule 2 for the nodes whose set of reachable nodes changed.
         For every pair of adjacent node (a) and (b), if there exist a completely directed path from
         (a) to (b) then a -> b. 
         """
-        arrow_added = False
+        new_arrows = []
+        for v_a in nodes:
+            for v_b in self._get_undirected_neighbors(v_a):
+                if v_b in self._reachable[v_a] and v_a not in self._reachable[v_b]:
+                    new_arrows.append((v_a, v_b))
+        return new_arrows
+    
+    def _recursion_rule_3(self, v_a, v_c):
+        """
+        Apply recursion rule 3 around the arrow a -> c.
+        If there is another arrow b -> c, with a and b nonadjacent, and a node d linked
+        to a, b and c by edges with no arrow, then d -> c.
+        """
+        new_arrows = []
+        neighbors = self.graph.get_neighbors(v_a)
+        other_parents = [v_b for v_b in self.graph.get_predecessors(v_c) 
+                         if v_b != v_a and v_b not in neighbors]
+        if len(other_parents) == 0:
+            return new_arrows
         
-        for v_a in self.nodes:
-            # Find the adjacent neighbors to v_a
-            neighbors = self.graph.get_neighbors(v_a)
-            
-            # If no neighbor, skip to the next node
-            if len(neighbors) == 0:
+        for v_d in self._get_undirected_neighbors(v_c):
+            undirected_neighbors = self._get_undirected_neighbors(v_d)
+            if v_a in undirected_neighbors and any(v_b in undirected_neighbors for v_b in other_parents):
+                new_arrows.append((v_d, v_c))
+        return new_arrows
+    
+    def _add_reachability(self, v_a, v_b):
+        """
+        Update the reachable nodes after adding the arrow a -> b: every node that reaches `a`
+        now reaches `b` and the nodes reachable from `b`.
+        
+        Returns:
+            list of the nodes whose set of reachable nodes changed
+        """
+        new_reachable = set([v_b]) | self._reachable[v_b]
+        changed = []
+        for v in [v_a] + [v for v in self.graph.nodes() if v_a in self._reachable[v]]:
+            if not new_reachable <= self._reachable[v]:
+                self._reachable[v] |= new_reachable
+                changed.append(v)
+        return changed
+
+
+def _find_conditioning_set(task, data, independence_test):
+    """
+    Going from 1-node sets to larger sets, find the first set of conditioning nodes
+    that makes `v_a` and `v_b` independent. Return None if there is no such set.
+    """
+    (v_a, v_b, conditioning_nodes, categorical_outcome, max_depth) = task
+    
+    max_size = len(conditioning_nodes)
+    if max_depth is not None:
+        max_size = min(max_size, max_depth)
+    z_sets = (z_set for q in range(1, max_size+1) for z_set in get_all_possible_sets(conditioning_nodes, q))
+    
+    return _find_first_independent_set(independence_test, v_a, v_b, z_sets, categorical_outcome, data)
+
+
+def _find_conditioning_set_including(task, data, independence_test):
+    """
+    Same as _find_conditioning_set, but only for the sets that include at least one of `required_nodes`
+    """
+    (v_a, v_b, conditioning_nodes, required_nodes, categorical_outcome, max_depth) = task
+    
+    max_size = len(conditioning_nodes)
+    if max_depth is not None:
+        max_size = min(max_size, max_depth)
+    z_sets = (z_set for q in range(1, max_size+1) for z_set in get_all_possible_sets(conditioning_nodes, q)
+              if any(v in required_nodes for v in z_set))
+    
+    return _find_first_independent_set(independence_test, v_a, v_b, z_sets, categorical_outcome, data)
+
+
+def _retest_edge(task, data, independence_test):
+    """
+    Test the independence of `v_a` and `v_b` given one conditioning set
+    
+    Returns:
+        IndependenceTestResult, duration of the test in seconds
+    """
+    (v_a, v_b, z_set, categorical_outcome) = task
+    return timed_test(independence_test, x = [v_a], y = v_b, z = list(z_set), 
+                      categorical_outcome=categorical_outcome, data = data)
+
+
+def _find_conditioning_set_at_depth(task, data, independence_test):
+    """
+    Find the first set of `depth` nodes adjacent to `v_a`, then to `v_b`, that makes 
+    `v_a` and `v_b` independent. Return None if there is no such set.
+    """
+    (v_a, v_b, neighbors_a, neighbors_b, depth, categorical_outcome) = task
+    
+    def z_sets():
+        tested = set()
+        for neighbors in (neighbors_a, neighbors_b):
+            if len(neighbors) < depth:
                 continue
-                
-            for v_b in neighbors:
-                
-                # If we already have a direction for that edge, skip on to the next adjacent neighbor
-                if self.graph.get_edge_orientation(v_a,v_b) is not None:
-                    continue
-                
-                # Find all the paths between v_a and v_b
-                paths = self.graph.get_all_paths(v_a, v_b)
-                
-                # Find if at least one of these paths is composed only of arrows leading from v_a to v_b
-                for path in paths:
+            for z_set in get_all_possible_sets(neighbors, depth):
+                if frozenset(z_set) not in tested:
+                    tested.add(frozenset(z_set))
+                    yield z_set
                     
-                    directed = True
-                    
-                    # Iterate through the pair of (x, y) neighboring nodes in the path
-                    for (x, y) in zip(path[:-1], path[1:]):
-                        # If you find that on the path, one of the links is wrong-headed, directed=False
-                        if self.graph.get_edge_orientation(x,y) != y:
-                            directed = False
-                            break
-                            
-                    if directed is True:
-                        self.graph.set_edge_orientation(v_a,v_b)
-                        arrow_added = True
-                        break
-                        
-        return arrow_added
\ No newline at end of file
+    return _find_first_independent_set(independence_test, v_a, v_b, z_sets(), categorical_outcome, data)
+    
+
+def _find_first_independent_set(independence_test, v_a, v_b, z_sets, categorical_outcome, data):
+    """
+    Returns:
+        the first set that makes `v_a` and `v_b` independent, or None
+        list of the durations of the tests, in seconds
+        the weakest test, i.e. the independent set, or else the set tested with the highest 
+        p-value (the last set tested if the test gives no p-values), and its p-value
+    """
+    if hasattr(independence_test, 'test_sets'):
+        return _find_first_independent_set_batched(independence_test, v_a, v_b, z_sets, categorical_outcome, data)
+    
+    latencies = []
+    weakest_test = (None, None)
+    for z_set in z_sets:
+        
+        result, latency = timed_test(independence_test, x = [v_a], y = v_b, z = list(z_set), 
+                                     categorical_outcome=categorical_outcome, data = data)
+        latencies.append(latency)
+        
+        if result.independent:
+            return z_set, latencies, (z_set, result.pvalue)
+        weakest_test = _weakest_test(weakest_test, z_set, result.pvalue)
+        
+    return None, latencies, weakest_test
+
+
+def _find_first_independent_set_batched(independence_test, v_a, v_b, z_sets, categorical_outcome, data, batch_size=64):
+    """
+    Same as _find_first_independent_set, for tests that can test many conditioning sets with one call.
+    The sets are tested by batches; the duration of a batch is shared between its tests.
+    """
+    z_sets = iter(z_sets)
+    latencies = []
+    weakest_test = (None, None)
+    while True:
+        batch = list(itertools.islice(z_sets, batch_size))
+        if len(batch) == 0:
+            return None, latencies, weakest_test
+        
+        start = time.perf_counter()
+        results = independence_test.test_sets(x = [v_a], y = v_b, z_sets = batch, 
+                                              categorical_outcome=categorical_outcome, data = data)
+        latency = (time.perf_counter() - start) / len(batch)
+        
+        for z_set, result in zip(batch, results):
+            latencies.append(latency)
+            if result.independent:
+                return z_set, latencies, (z_set, result.pvalue)
+            weakest_test = _weakest_test(weakest_test, z_set, result.pvalue)
+
+
+def _weakest_test(weakest_test, z_set, pvalue):
+    """
+    Returns:
+        the test with the highest p-value between `weakest_test` and the test of `z_set`
+    """
+    if pvalue is None or weakest_test[1] is None or pvalue > weakest_test[1]:
+        return (z_set, pvalue)
+    return weakest_test
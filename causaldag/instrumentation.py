@@ -0,0 +1,145 @@
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class InferenceCancelled(Exception):
+    """
+    Raised when a run is cancelled through its instrumentation
+    """
+    pass
+
+
+class Instrumentation():
+    """
+    Collects timings and counters while IC_star or Implications run, and reports progress
+    to a user-supplied callback and/or logger.
+    
+    The callback is called as `callback(event, info)`, where `event` is one of 'phase_start', 
+    'phase_end' or 'progress' and `info` a dict. If it returns False, the run is cancelled: 
+    InferenceCancelled is raised at the next checkpoint. `cancel()` can also be called 
+    from another thread.
+    
+    Attributes:
+        phase_times (dict of str to float): total time spent in each phase, in seconds
+        phase (str): phase in progress
+        n_tests (int): number of independence tests run
+        test_time (float): total duration of the independence tests, in seconds
+        latency_histogram (dict of float to int): number of tests whose duration was below each
+            bound (in seconds), and above the previous one
+        cancelled (bool): whether the run was cancelled
+    """
+    # Upper bounds of the latency histogram buckets, in seconds
+    LATENCY_BOUNDS = [10.**k for k in range(-6, 3)] + [math.inf]
+    
+    def __init__(self, callback=None, logger=None):
+        """
+        Parameters:
+            callback (callable): progress callback, see above
+            logger (logging.Logger): logger to which the events are reported at INFO level
+        """
+        self.callback = callback
+        self.logger = logger
+        self.phase_times = {}
+        self.phase = None
+        self.n_tests = 0
+        self.test_time = 0.
+        self.latency_histogram = {bound: 0 for bound in self.LATENCY_BOUNDS}
+        self.cancelled = False
+        self._cache = None
+        self._lock = threading.Lock()
+        
+    @contextmanager
+    def phase_timer(self, name):
+        """
+        Time a phase of the run
+        """
+        self.check()
+        self.phase = name
+        self._emit('phase_start', {'phase': name})
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phase_times[name] = self.phase_times.get(name, 0.) + elapsed
+            self.phase = None
+        self._emit('phase_end', {'phase': name, 'seconds': elapsed})
+        
+    def record_tests(self, latencies):
+        """
+        Count independence tests, given their durations in seconds
+        """
+        with self._lock:
+            for latency in latencies:
+                self.n_tests += 1
+                self.test_time += latency
+                for bound in self.LATENCY_BOUNDS:
+                    if latency <= bound:
+                        self.latency_histogram[bound] += 1
+                        break
+                    
+    def watch_cache(self, independence_test):
+        """
+        Report the hit rate of the test if it is a CachedIndependenceTest
+        (only the lookups made in this process are counted: with a pool of processes,
+        none are, and the hit rate is None)
+        """
+        if hasattr(independence_test, 'hits') and hasattr(independence_test, 'misses'):
+            self._cache = independence_test
+        
+    @property
+    def cache_hit_rate(self):
+        if self._cache is None or self._cache.hits + self._cache.misses == 0:
+            return None
+        return self._cache.hit_rate
+    
+    def progress(self, **info):
+        """
+        Report progress within the current phase, and stop if the run was cancelled
+        """
+        info = dict(info, phase=self.phase, n_tests=self.n_tests)
+        self._emit('progress', info)
+        self.check()
+        
+    def cancel(self):
+        self.cancelled = True
+        
+    def check(self):
+        """
+        Raise InferenceCancelled if the run was cancelled
+        """
+        if self.cancelled:
+            raise InferenceCancelled('Cancelled during phase {}'.format(self.phase))
+        
+    def summary(self):
+        """
+        Returns:
+            dict with the collected timings and counters
+        """
+        return {
+            'phase_times': dict(self.phase_times),
+            'n_tests': self.n_tests,
+            'test_time': self.test_time,
+            'mean_test_latency': self.test_time / self.n_tests if self.n_tests > 0 else None,
+            'latency_histogram': dict(self.latency_histogram),
+            'cache_hit_rate': self.cache_hit_rate,
+        }
+    
+    def __getstate__(self):
+        # Locks cannot be pickled, e.g. along with an IC_star object
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        
+    def _emit(self, event, info):
+        if self.logger is not None:
+            self.logger.log(logging.INFO, '%s %s', event, info)
+        if self.callback is not None and self.callback(event, info) is False:
+            self.cancel()
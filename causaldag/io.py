@@ -0,0 +1,297 @@
+"""
+Compact binary format to save and reload graphs, IC* results and validation results.
+
+A file is made of:
+    - the magic bytes b'CAUSLDAG', then the version of the format and the length of the header
+      (little-endian unsigned 32-bit integers)
+    - a JSON header: type of the object, labels of the nodes, other attributes, and the dtype,
+      shape and position of each array
+    - the arrays, each aligned on 64 bytes, so that they can be memory-mapped
+
+Nodes are stored by position, edges as pairs of positions, and sets of nodes (conditioning
+sets, implications) in compressed sparse row form: the nodes of all the sets one after the
+other, and the position where each set starts.
+"""
+import json
+import math
+import struct
+from collections.abc import Sequence
+import numpy as np
+from .graphs import Graph, CausalDAG
+
+MAGIC = b'CAUSLDAG'
+VERSION = 1
+ALIGNMENT = 64
+
+# Outcome of the test of each implication
+OUTCOMES = ['agreements', 'weak_contradictions', 'strong_contradictions']
+
+
+def save(obj, path):
+    """
+    Save a Graph, a CausalDAG, an IC_star result or an Implications result to `path`
+    """
+    from .inference import IC_star
+    from .validation import Implications
+
+    if isinstance(obj, Graph):
+        nodes = obj.nodes()
+        header, arrays = {'type': type(obj).__name__}, _encode_graph(obj, nodes)
+    elif isinstance(obj, IC_star):
+        nodes = obj.graph.nodes()
+        header, arrays = _encode_inference(obj, nodes)
+    elif isinstance(obj, Implications):
+        nodes = obj.graph.nodes()
+        header, arrays = _encode_implications(obj, nodes)
+    else:
+        raise ValueError('Wrong input: expects a Graph, a CausalDAG, an IC_star or an Implications object')
+
+    if not all(isinstance(v, str) for v in nodes):
+        raise ValueError('Wrong input: only graphs whose nodes are labelled by strings can be saved')
+    header['nodes'] = list(nodes)
+
+    # Position of each array, relative to the end of the header
+    header['arrays'] = {}
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _align(offset + array.nbytes)
+
+    encoded_header = json.dumps(header).encode()
+    start = _align(len(MAGIC) + 8 + len(encoded_header))
+    with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<II', VERSION, len(encoded_header)) + encoded_header)
+        for name, array in arrays.items():
+            f.seek(start + header['arrays'][name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(start + offset)
+
+
+def load(path, mmap=True):
+    """
+    Load an object saved with `save`.
+
+    An IC_star result comes back with its graph, conditioning sets and weakest tests, but
+    without data nor independence test: set `independence_test` before calling `update`.
+    The tables of an Implications result are decoded lazily, row by row when accessed.
+
+    Params:
+        path (str): file to read
+        mmap (bool): if true (default), the arrays are memory-mapped instead of read, so that
+            only the parts of the tables that are used are read from disk
+
+    Returns:
+        Graph, CausalDAG, IC_star or Implications
+    """
+    with open(path, 'rb') as f:
+        preamble = f.read(len(MAGIC) + 8)
+        if preamble[:len(MAGIC)] != MAGIC:
+            raise ValueError('Wrong input: {} is not a causaldag file'.format(path))
+        version, header_length = struct.unpack('<II', preamble[len(MAGIC):])
+        if version > VERSION:
+            raise ValueError('Wrong input: {} uses version {} of the format, only versions up to {} are supported'
+                             .format(path, version, VERSION))
+        header = json.loads(f.read(header_length).decode())
+    start = _align(len(MAGIC) + 8 + header_length)
+
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        buffer = np.fromfile(path, dtype=np.uint8)
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        size = dtype.itemsize * math.prod(spec['shape'])
+        position = start + spec['offset']
+        arrays[name] = buffer[position:position+size].view(dtype).reshape(spec['shape'])
+
+    nodes = header['nodes']
+    if header['type'] in ('Graph', 'CausalDAG'):
+        return _decode_graph(header['type'], nodes, arrays)
+    if header['type'] == 'IC_star':
+        return _decode_inference(header, nodes, arrays)
+    if header['type'] == 'Implications':
+        return _decode_implications(header, nodes, arrays)
+    raise ValueError('Wrong input: unknown object type {}'.format(header['type']))
+
+
+class ImplicationTable(Sequence):
+    """
+    Read-only sequence of (x, y, z, independence_flag) implications, decoded when accessed
+    from the arrays of a saved Implications result.
+
+    Attributes:
+        x, y (numpy.ndarray): positions of the nodes x and y of each row
+        flags (numpy.ndarray): whether the graph implies the independence of x and y given z
+        z_indptr, z_indices (numpy.ndarray): conditioning sets, in compressed sparse row form
+    """
+    def __init__(self, nodes, x, y, flags, z_indptr, z_indices, rows=None):
+        self.nodes = nodes
+        self.x, self.y, self.flags = x, y, flags
+        self.z_indptr, self.z_indices = z_indptr, z_indices
+        # Rows of the arrays in the table, default is all of them
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.x) if self.rows is None else len(self.rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('ImplicationTable index out of range')
+        row = i if self.rows is None else int(self.rows[i])
+
+        z = self.z_indices[self.z_indptr[row]:self.z_indptr[row+1]]
+        return (self.nodes[self.x[row]], self.nodes[self.y[row]], [self.nodes[v] for v in z], bool(self.flags[row]))
+
+
+def _encode_graph(graph, nodes, prefix=''):
+    index = {v: i for i, v in enumerate(nodes)}
+    edges = list(graph.edges())
+    # Orientation of each edge: 1 from the first node to the second, -1 the other way, 0 none
+    orientations = []
+    for (v_a, v_b) in edges:
+        orientation = graph.get_edge_orientation(v_a, v_b)
+        orientations.append(1 if orientation == v_b else -1 if orientation == v_a else 0)
+
+    return {
+        prefix + 'edges': np.array([[index[v_a], index[v_b]] for (v_a, v_b) in edges], dtype='<i4').reshape(-1, 2),
+        prefix + 'orientations': np.array(orientations, dtype='i1'),
+    }
+
+
+def _decode_graph(kind, nodes, arrays, prefix=''):
+    graph = CausalDAG() if kind == 'CausalDAG' else Graph()
+    for v in nodes:
+        graph.add_node(v)
+    for (i, j), orientation in zip(arrays[prefix + 'edges'].tolist(), arrays[prefix + 'orientations'].tolist()):
+        if orientation == -1:
+            i, j = j, i
+        graph.add_edge(nodes[i], nodes[j])
+        if orientation != 0 and kind != 'CausalDAG':
+            graph.set_edge_orientation(nodes[i], nodes[j])
+    return graph
+
+
+def _encode_sets(sets, index, prefix):
+    """
+    Encode a dict from pairs of nodes to sets of nodes
+    """
+    pairs = list(sets)
+    indptr = np.zeros(len(pairs) + 1, dtype='<i8')
+    indptr[1:] = np.cumsum([len(sets[pair]) for pair in pairs])
+    return {
+        prefix + '_pairs': np.array([[index[v_a], index[v_b]] for (v_a, v_b) in pairs], dtype='<i4').reshape(-1, 2),
+        prefix + '_indptr': indptr,
+        prefix + '_indices': np.array([index[v] for pair in pairs for v in sets[pair]], dtype='<i4'),
+    }
+
+
+def _decode_sets(nodes, arrays, prefix):
+    indptr, indices = arrays[prefix + '_indptr'].tolist(), arrays[prefix + '_indices'].tolist()
+    return {(nodes[i], nodes[j]): tuple(nodes[v] for v in indices[indptr[k]:indptr[k+1]])
+            for k, (i, j) in enumerate(arrays[prefix + '_pairs'].tolist())}
+
+
+def _encode_inference(inference, nodes):
+    index = {v: i for i, v in enumerate(nodes)}
+    # Pairs never tested have no weakest test
+    weakest_tests = {pair: test for pair, test in inference.weakest_tests.items() if test[0] is not None}
+
+    arrays = _encode_graph(inference.graph, nodes, prefix='graph_')
+    arrays.update(_encode_sets(inference.conditioning_sets, index, 'conditioning_sets'))
+    arrays.update(_encode_sets({pair: test[0] for pair, test in weakest_tests.items()}, index, 'weakest_tests'))
+    arrays['weakest_tests_pvalues'] = np.array([np.nan if test[1] is None else test[1]
+                                                for test in weakest_tests.values()], dtype='<f8')
+
+    header = {
+        'type': 'IC_star',
+        'graph_type': type(inference.graph).__name__,
+        'categorical_vars': list(inference.categorical_vars),
+        'skeleton': inference.skeleton,
+        'max_depth': inference.max_depth,
+    }
+    return header, arrays
+
+
+def _decode_inference(header, nodes, arrays):
+    from .inference import IC_star
+    from .executors import SerialExecutor
+    from .instrumentation import Instrumentation
+
+    # The object is rebuilt without running the inference, which needs the data
+    inference = IC_star.__new__(IC_star)
+    inference.data = None
+    inference.independence_test = None
+    inference.executor = SerialExecutor()
+    inference.nodes = list(nodes)
+    inference.categorical_vars = header['categorical_vars']
+    inference.skeleton = header['skeleton']
+    inference.max_depth = header['max_depth']
+    inference.instrumentation = Instrumentation()
+    inference.graph = _decode_graph(header['graph_type'], nodes, arrays, prefix='graph_')
+    inference.conditioning_sets = _decode_sets(nodes, arrays, 'conditioning_sets')
+
+    pvalues = arrays['weakest_tests_pvalues'].tolist()
+    inference.weakest_tests = {pair: (z_set, None if math.isnan(pvalue) else pvalue)
+                               for (pair, z_set), pvalue in zip(_decode_sets(nodes, arrays, 'weakest_tests').items(), pvalues)}
+    return inference
+
+
+def _encode_implications(implications, nodes):
+    index = {v: i for i, v in enumerate(nodes)}
+    # The tables of the outcomes keep the order of the implications, so storing the outcome of each is enough
+    outcomes = {}
+    for code, name in enumerate(OUTCOMES):
+        for (x, y, z, flag) in getattr(implications, name):
+            outcomes[x, y, tuple(z), flag] = code
+
+    rows = implications.implications
+    indptr = np.zeros(len(rows) + 1, dtype='<i8')
+    indptr[1:] = np.cumsum([len(z) for (_, _, z, _) in rows])
+    arrays = _encode_graph(implications.graph, nodes, prefix='graph_')
+    arrays.update({
+        'implications_x': np.array([index[x] for (x, _, _, _) in rows], dtype='<i4'),
+        'implications_y': np.array([index[y] for (_, y, _, _) in rows], dtype='<i4'),
+        'implications_flags': np.array([flag for (_, _, _, flag) in rows], dtype='u1'),
+        'implications_outcomes': np.array([outcomes[x, y, tuple(z), flag] for (x, y, z, flag) in rows], dtype='u1'),
+        'implications_z_indptr': indptr,
+        'implications_z_indices': np.array([index[v] for (_, _, z, _) in rows for v in z], dtype='<i4'),
+    })
+
+    header = {
+        'type': 'Implications',
+        'graph_type': type(implications.graph).__name__,
+        'categorical_vars': list(implications.categorical_vars),
+        'basis': implications.basis,
+    }
+    return header, arrays
+
+
+def _decode_implications(header, nodes, arrays):
+    from .validation import Implications
+    from .executors import SerialExecutor
+    from .instrumentation import Instrumentation
+
+    implications = Implications.__new__(Implications)
+    implications.graph = _decode_graph(header['graph_type'], nodes, arrays, prefix='graph_')
+    implications.data = None
+    implications.independence_test = None
+    implications.categorical_vars = header['categorical_vars']
+    implications.basis = header['basis']
+    implications.executor = SerialExecutor()
+    implications.instrumentation = Instrumentation()
+
+    columns = [arrays['implications_' + name] for name in ['x', 'y', 'flags', 'z_indptr', 'z_indices']]
+    implications.implications = ImplicationTable(nodes, *columns)
+    outcomes = arrays['implications_outcomes']
+    for code, name in enumerate(OUTCOMES):
+        setattr(implications, name, ImplicationTable(nodes, *columns, rows=np.flatnonzero(outcomes == code)))
+    return implications
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
@@ -0,0 +1,426 @@
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+# A column is considered collinear with others if less than this share of its norm is not explained by them
+TOLERANCE = 1e-10
+
+# Median of the absolute value of a standard normal
+MAD_NORMALIZATION = 0.6744897501960817
+
+# scipy.linalg, imported on first use so that importing the package stays fast
+_scipy_linalg = None
+
+
+class CholeskyFactor():
+    """
+    Upper triangular factor R of the Gram matrix of a set of columns, G = R'R.
+    A factor can be extended by one column or reduced by one column without being
+    recomputed from scratch. Factors are never modified in place, so they can be shared
+    between the entries of a cache.
+
+    Columns that are (numerically) collinear with the columns already in the factor
+    are left out of it, as a pseudo-inverse would do.
+    """
+
+    def __init__(self, gram, tolerance=TOLERANCE):
+        """
+        Parameters:
+            gram (numpy.ndarray): Gram matrix of all the columns
+            tolerance (float): a column is left out if the share of its norm that is not
+                explained by the columns in the factor is below this value
+        """
+        self.gram = gram
+        self.tolerance = tolerance
+        # Columns of the factor, in the order of its rows
+        self.columns = ()
+        # Columns left out because they were collinear
+        self.dropped = frozenset()
+        self.factor = np.zeros((0, 0))
+
+    @property
+    def variables(self):
+        """
+        Set of all the columns requested, including the ones left out
+        """
+        return frozenset(self.columns) | self.dropped
+
+    def extend(self, columns):
+        """
+        Returns:
+            factor with all of the `columns` added
+        """
+        factor = self
+        for column in columns:
+            factor = factor.append(column)
+        return factor
+
+    def append(self, column):
+        """
+        Add a column by solving one triangular system, in O(p^2) instead of O(p^3)
+
+        Returns:
+            CholeskyFactor
+        """
+        if column in self.variables:
+            return self
+
+        p = len(self.columns)
+        cross_products = self.gram[list(self.columns), column]
+        r = _linalg().solve_triangular(self.factor, cross_products, trans='T') if p > 0 else cross_products
+        residual = self.gram[column, column] - r @ r
+
+        if residual <= self.tolerance * max(self.gram[column, column], np.finfo(float).tiny):
+            return self._copy(self.columns, self.dropped | {column}, self.factor)
+
+        factor = np.zeros((p+1, p+1))
+        factor[:p, :p] = self.factor
+        factor[:p, p] = r
+        factor[p, p] = np.sqrt(residual)
+        return self._copy(self.columns + (column,), self.dropped, factor)
+
+    def delete(self, column):
+        """
+        Remove a column by restoring the triangular form with Givens rotations, in O(p^2)
+
+        Returns:
+            CholeskyFactor
+        """
+        if column in self.dropped:
+            return self._copy(self.columns, self.dropped - {column}, self.factor)
+        if column not in self.columns:
+            return self
+
+        k = self.columns.index(column)
+        p = len(self.columns)
+        factor = np.delete(self.factor, k, axis=1)
+
+        # Step 1: the rows below k have one non-zero value under the diagonal
+        for i in range(k, p-1):
+            a, b = factor[i, i], factor[i+1, i]
+            r = np.hypot(a, b)
+            c, s = a / r, b / r
+            top, bottom = factor[i, i:].copy(), factor[i+1, i:].copy()
+            factor[i, i:] = c * top + s * bottom
+            factor[i+1, i:] = c * bottom - s * top
+
+        reduced = self._copy(self.columns[:k] + self.columns[k+1:], frozenset(), factor[:p-1])
+
+        # Step 2: the columns left out may not be collinear anymore
+        return reduced.extend(sorted(self.dropped))
+
+    def project(self, columns):
+        """
+        Returns:
+            numpy.ndarray: Gram matrix of the residuals of `columns` after regression on the factor's columns
+        """
+        columns = list(columns)
+        gram = self.gram[np.ix_(columns, columns)]
+        if len(self.columns) == 0:
+            return gram
+        projection = _linalg().solve_triangular(self.factor, self.gram[np.ix_(list(self.columns), columns)], trans='T')
+        return gram - projection.T @ projection
+
+    def _copy(self, columns, dropped, factor):
+        copy = CholeskyFactor(self.gram, self.tolerance)
+        copy.columns = columns
+        copy.dropped = dropped
+        copy.factor = factor
+        return copy
+
+
+class GramRegression():
+    """
+    Least squares regressions computed from the Gram matrix X'X of the data, without going
+    back to the rows.
+
+    Factors of the Gram matrix of the conditioned variables are cached: a conditioning set
+    that differs from a cached one by a single variable is factorised with one update instead
+    of from scratch, which is the common case when conditioning sets grow one variable at a time.
+    """
+
+    def __init__(self, gram, columns, n, means=None, maxsize=10000):
+        """
+        Parameters:
+            gram (numpy.ndarray): uncentered cross-products X'X
+            columns (list of str): names of the columns of `gram`
+            n (int): number of observations
+            means (numpy.ndarray): if given, an intercept is added to every regression
+            maxsize (int): maximum number of cached factors
+        """
+        self.columns = list(columns)
+        self.index = {column: i for i, column in enumerate(self.columns)}
+        self.n = n
+        self.maxsize = maxsize
+
+        self.intercept = means is not None
+        if self.intercept:
+            p = len(self.columns)
+            augmented = np.empty((p+1, p+1))
+            augmented[:p, :p] = gram
+            augmented[:p, p] = augmented[p, :p] = n * np.asarray(means)
+            augmented[p, p] = n
+            gram = augmented
+        self.gram = np.ascontiguousarray(gram, dtype=float)
+
+        self._factors = OrderedDict()
+        self._last = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_statistics(cls, statistics, intercept=True, maxsize=10000):
+        """
+        Parameters:
+            statistics (SufficientStatistics)
+        """
+        means = statistics.mean().to_numpy() if intercept else None
+        return cls(statistics.gram().to_numpy(), statistics.continuous_vars, statistics.n, means, maxsize)
+
+    def regress(self, x, y, z):
+        """
+        Regress `y` on each of the variables of `x` in turn, together with the variables of `z`.
+        All the variables of `x` are handled by one call.
+
+        Parameters:
+            x (list of str): regressors whose coefficient is returned
+            y (str): outcome
+            z (list of str): conditioned variables
+
+        Returns:
+            numpy.ndarray: coefficient of each variable of `x`
+            numpy.ndarray: its standard error
+            numpy.ndarray: the residual degrees of freedom of each regression
+        """
+        factor = self.get_factor([self.index[v] for v in z])
+        residual = factor.project([self.index[v] for v in x] + [self.index[y]])
+        degrees_of_freedom = np.full(len(x), self.n - len(factor.columns) - 1)
+        return _partial_coefficients(np.diag(residual)[:-1], residual[:-1, -1], residual[-1, -1], degrees_of_freedom)
+
+    def regress_sets(self, x, y, z_sets):
+        """
+        Regress `y` on `x` together with each of the conditioning sets.
+        The sets of the same size are handled by one batched solve.
+
+        Returns:
+            numpy.ndarray: coefficient of `x` in each regression
+            numpy.ndarray: its standard error
+            numpy.ndarray: the residual degrees of freedom of each regression
+        """
+        coefficients, standard_errors, degrees_of_freedom = (np.empty(len(z_sets)) for _ in range(3))
+        intercept = [len(self.columns)] if self.intercept else []
+
+        by_size = {}
+        for i, z_set in enumerate(z_sets):
+            by_size.setdefault(len(z_set), []).append(i)
+
+        for size, positions in by_size.items():
+            # Design of each regression: x first, then the conditioned variables
+            design = np.array([[self.index[x]] + [self.index[v] for v in z_sets[i]] + intercept for i in positions])
+            outcome = self.index[y]
+            gram = self.gram[design[:, :, None], design[:, None, :]]
+            cross_products = self.gram[design, outcome]
+
+            right_hand_side = np.zeros(design.shape + (2,))
+            right_hand_side[:, :, 0] = cross_products
+            right_hand_side[:, 0, 1] = 1
+            try:
+                solution = np.linalg.solve(gram, right_hand_side)
+                inverse = solution[:, 0, 1]
+                # The determinant relative to the product of the diagonal is close to zero for collinear designs
+                sign, log_determinant = np.linalg.slogdet(gram)
+                conditioning = log_determinant - np.log(np.diagonal(gram, axis1=1, axis2=2)).sum(axis=1)
+                valid = (np.all(np.isfinite(solution), axis=(1, 2)) & (inverse > 0) & (sign > 0) 
+                         & (conditioning > np.log(TOLERANCE)))
+            except np.linalg.LinAlgError:
+                valid = np.zeros(len(positions), dtype=bool)
+
+            if valid.any():
+                coefficient = solution[valid, 0, 0]
+                residual_sum = self.gram[outcome, outcome] - np.einsum('ij,ij->i', cross_products[valid], solution[valid, :, 0])
+                dof = np.full(valid.sum(), self.n - design.shape[1])
+                # The coefficient of x is that of the regression on the residuals of x, whose sum of squares is 1 / inverse
+                coefficient, standard_error, dof = _partial_coefficients(1 / inverse[valid], coefficient / inverse[valid],
+                                                                         residual_sum + coefficient**2 / inverse[valid], dof)
+                index = np.asarray(positions)[valid]
+                coefficients[index], standard_errors[index], degrees_of_freedom[index] = coefficient, standard_error, dof
+
+            # Singular designs go through the factorisation, which leaves out collinear variables
+            for i in np.asarray(positions)[~valid]:
+                coefficients[i], standard_errors[i], degrees_of_freedom[i] = (a[0] for a in self.regress([x], y, z_sets[i]))
+
+        return coefficients, standard_errors, degrees_of_freedom
+
+    def get_factor(self, columns):
+        """
+        Returns:
+            CholeskyFactor of the Gram matrix of `columns` (and of the intercept)
+        """
+        if self.intercept:
+            columns = list(columns) + [len(self.columns)]
+        key = frozenset(columns)
+
+        # The cache and the last factor are shared by the threads running tests
+        with self._lock:
+            if key in self._factors:
+                self._factors.move_to_end(key)
+                factor = self._factors[key]
+            else:
+                factor = self._update_factor(key, columns, self._last)
+                self._factors[key] = factor
+                if len(self._factors) > self.maxsize:
+                    self._factors.popitem(last=False)
+
+            self._last = factor
+        return factor
+
+    def _update_factor(self, key, columns, last):
+        # Step 1: a cached set with one variable less
+        for column in reversed(columns):
+            parent = self._factors.get(key - {column})
+            if parent is not None:
+                return parent.append(column)
+
+        # Step 2: the last set used, with one variable replaced
+        if last is not None:
+            removed, added = last.variables - key, key - last.variables
+            if len(removed) == 1 and len(added) == 1:
+                return last.delete(next(iter(removed))).append(next(iter(added)))
+
+        # Step 3: from scratch
+        return CholeskyFactor(self.gram).extend(columns)
+
+    def __getstate__(self):
+        # The cached factors are recomputed on the other side
+        state = self.__dict__.copy()
+        state['_factors'] = OrderedDict()
+        state['_last'] = None
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def _partial_coefficients(x_sum_squares, cross_products, y_sum_squares, degrees_of_freedom):
+    """
+    Coefficient and standard error of the regression of residualized y on residualized x.
+    A regressor collinear with the conditioned variables gets a zero coefficient and an
+    infinite standard error.
+    """
+    x_sum_squares = np.asarray(x_sum_squares, dtype=float)
+    collinear = x_sum_squares <= 1e-12 * np.maximum(y_sum_squares, np.finfo(float).tiny)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coefficient = np.where(collinear, 0., cross_products / x_sum_squares)
+        residual_sum = np.maximum(y_sum_squares - coefficient * cross_products, 0)
+        variance = residual_sum / np.maximum(degrees_of_freedom, 1) / x_sum_squares
+        standard_error = np.where(collinear, np.inf, np.sqrt(variance))
+
+    return coefficient, standard_error, degrees_of_freedom
+
+
+def huber_regression(exog, endog, column=0, weights=None, threshold=1.345, tol=1e-8, maxiter=50):
+    """
+    Fit Huber's M-estimator by iteratively reweighted least squares, with the defaults of the
+    statsmodels RLM: scale re-estimated by the MAD at each iteration, convergence on the deviance
+    and H1 covariance. Only the coefficient of one column and its standard error are computed.
+
+    Parameters:
+        exog (numpy.ndarray): regressors, one column per variable
+        endog (numpy.ndarray): outcome
+        column (int): column of `exog` whose coefficient is returned
+        weights (numpy.ndarray): weights of the first iteration, e.g. those of a previous fit
+            of a similar model. By default, the first iteration is an ordinary least squares fit
+        threshold (float): residuals larger than `threshold` times the scale are down-weighted
+
+    Returns:
+        float: coefficient of `column`
+        float: its standard error
+        numpy.ndarray: weights of the last iteration
+    """
+    n, p = exog.shape
+    if weights is None:
+        weights = np.ones(n)
+
+    # Step 1: initial fit
+    params, residuals, weighted_scale = _weighted_least_squares(exog, endog, weights)
+    scale = _mad(residuals)
+    deviance = _huber_rho(residuals / weighted_scale, threshold).sum()
+
+    # Step 2: reweight until the deviance stops changing
+    for _ in range(1, maxiter):
+        if scale == 0:
+            break
+        weights = _huber_weights(residuals / scale, threshold)
+        params, residuals, weighted_scale = _weighted_least_squares(exog, endog, weights)
+        scale = _mad(residuals)
+        previous_deviance, deviance = deviance, _huber_rho(residuals / weighted_scale, threshold).sum()
+        if abs(deviance - previous_deviance) <= tol:
+            break
+
+    # Step 3: H1 covariance of the coefficient
+    gram = exog.T @ exog
+    rank = np.linalg.matrix_rank(gram, hermitian=True)
+    standardized = residuals / scale if scale != 0 else np.zeros(n)
+    inliers = (np.abs(standardized) <= threshold).astype(float)
+    psi = np.clip(standardized, -threshold, threshold)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        m = inliers.mean()
+        k = 1 + rank / n * inliers.var() / m**2
+        variance = (k**2 * (psi @ psi * scale**2 / (n - rank)) / m**2 
+                    * np.linalg.pinv(gram, hermitian=True)[column, column])
+
+    return float(params[column]), float(np.sqrt(variance)), weights
+
+
+def _weighted_least_squares(exog, endog, weights):
+    """
+    Returns:
+        numpy.ndarray: coefficients of the weighted least squares fit
+        numpy.ndarray: its residuals
+        float: weighted residual variance
+    """
+    linalg = _linalg()
+    weighted_exog = exog * weights[:, None]
+    try:
+        params = linalg.cho_solve(linalg.cho_factor(exog.T @ weighted_exog, check_finite=False), weighted_exog.T @ endog, check_finite=False)
+    except np.linalg.LinAlgError:
+        # Collinear regressors: minimum norm solution, as a pseudo-inverse would give
+        root = np.sqrt(weights)
+        params = np.linalg.lstsq(exog * root[:, None], endog * root, rcond=None)[0]
+
+    residuals = endog - exog @ params
+    return params, residuals, (weights * residuals) @ residuals / (exog.shape[0] - exog.shape[1])
+
+
+def _linalg():
+    """
+    Returns:
+        module: scipy.linalg, imported once
+    """
+    global _scipy_linalg
+    if _scipy_linalg is None:
+        import scipy.linalg
+        _scipy_linalg = scipy.linalg
+    return _scipy_linalg
+
+
+def _mad(residuals):
+    """
+    Median absolute deviation around zero, normalized to estimate the standard deviation of a normal
+    """
+    return np.median(np.abs(residuals)) / MAD_NORMALIZATION
+
+
+def _huber_rho(z, threshold):
+    absolute = np.abs(z)
+    return np.where(absolute <= threshold, 0.5 * z**2, absolute * threshold - 0.5 * threshold**2)
+
+
+def _huber_weights(z, threshold):
+    absolute = np.abs(z)
+    with np.errstate(divide='ignore'):
+        return np.where(absolute <= threshold, 1., threshold / absolute)
@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+from .graphs import Graph
+from .inference import IC_star
+from .statistics import SufficientStatistics
+from .executors import SerialExecutor
+from .instrumentation import Instrumentation
+
+class StabilitySelection():
+    """
+    Runs the IC* inference on many resamples of the data, and measures how often each edge
+    is found and each orientation inferred.
+
+    When the independence test accepts SufficientStatistics, the rows are split once into blocks
+    whose statistics are computed in a single pass over the data. Each resample is then a draw
+    of blocks, whose statistics are merged without going back to the rows. Otherwise each
+    resample draws rows, from data that a ProcessPoolExecutor shares between its workers.
+
+    Attributes:
+        edge_frequencies (dict): share of the resamples in which each pair of nodes is adjacent
+        orientation_frequencies (dict): share of the resamples in which each arrow (v_a, v_b) is inferred
+        graph (Graph): the edges found in at least `threshold` of the resamples, oriented when
+            the same orientation is inferred in at least `threshold` of the resamples with the edge
+    """
+    def __init__(self, data, independence_test, n_resamples=100, method='subsample', fraction=0.5,
+                 n_blocks=20, threshold=0.5, categorical_vars=None, executor=None, seed=None,
+                 instrumentation=None, infer=True, **options):
+        """
+        Parameters:
+            data (pandas.DataFrame): data to infer a causal diagram from
+            independence_test (test object): method for testing independence between variables
+            n_resamples (int): number of resamples
+            method (str): how to resample the data
+                'subsample' (default): draw a `fraction` of the data without replacement
+                'bootstrap': draw as much data as there is, with replacement
+            fraction (float): share of the data in each subsample
+            n_blocks (int): number of blocks the rows are split into when the test accepts
+                SufficientStatistics. None draws rows instead, as for the other tests
+            threshold (float): minimum frequency of the edges and orientations kept in `graph`
+            categorical_vars (list of str): list of categorical variables
+            executor (executor object): how to run the resamples, e.g. on a pool of processes
+                (see causaldag.executors). Default runs them serially
+            seed (int): seed of the resampling
+            instrumentation (Instrumentation object): reports the progress of the resamples
+            infer (bool): if true (default), run the resamples immediately. Else call `infer()` later
+            options: other arguments of IC_star, e.g. `skeleton` or `max_depth`
+        """
+        if method not in ('subsample', 'bootstrap'):
+            raise ValueError('Wrong input: `method` expects "subsample" or "bootstrap"')
+        if not 0 < fraction <= 1:
+            raise ValueError('Wrong input: `fraction` expects a number between 0 and 1')
+
+        self.data = data
+        self.independence_test = independence_test
+        self.n_resamples = n_resamples
+        self.method = method
+        self.fraction = fraction
+        self.n_blocks = n_blocks
+        self.threshold = threshold
+        if categorical_vars is None:
+            self.categorical_vars = []
+        else:
+            self.categorical_vars = categorical_vars
+        if executor is None:
+            self.executor = SerialExecutor()
+        else:
+            self.executor = executor
+        self.seed = seed
+        if instrumentation is None:
+            self.instrumentation = Instrumentation()
+        else:
+            self.instrumentation = instrumentation
+        self.options = options
+
+        self.edge_frequencies = {}
+        self.orientation_frequencies = {}
+        self.graph = None
+        if infer:
+            self.infer()
+
+    def infer(self):
+        """
+        Run the inference on every resample and aggregate the results
+        """
+        with self.instrumentation.phase_timer('resamples'):
+            # Step 1: Data shared by the resamples
+            data = self._get_shared_data()
+            # Step 2: One independent random stream per resample, so that the results do not depend on the executor
+            seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(self.seed).spawn(self.n_resamples)]
+            tasks = [(self.method, self.fraction, seed, self.categorical_vars, self.options)
+                     for seed in seeds]
+
+            def on_result(i, result):
+                self.instrumentation.progress(resamples_done=i+1, resamples_total=len(tasks))
+
+            results = self.executor.map(_infer_resample, tasks, data, callback=on_result, 
+                                        context=self.independence_test)
+
+        with self.instrumentation.phase_timer('aggregation'):
+            self._aggregate(results)
+
+    def to_frame(self):
+        """
+        Returns:
+            pandas.DataFrame with the frequency of each edge, and of each of its orientations
+        """
+        rows = [(v_a, v_b, frequency, self.orientation_frequencies.get((v_a, v_b), 0.),
+                 self.orientation_frequencies.get((v_b, v_a), 0.))
+                for (v_a, v_b), frequency in self.edge_frequencies.items()]
+        frame = pd.DataFrame(rows, columns=['v_a', 'v_b', 'frequency', 'forward', 'backward'])
+        return frame.sort_values('frequency', ascending=False, kind='stable').reset_index(drop=True)
+
+    def _get_shared_data(self):
+        """
+        Returns:
+            the statistics of each block of rows if the test accepts them, else the data
+        """
+        if self.n_blocks is None or not getattr(self.independence_test, 'accepts_statistics', False):
+            return self.data
+
+        # The blocks are random, so that a draw of blocks is a draw of rows
+        rows = np.random.default_rng(self.seed).permutation(len(self.data))
+        return [SufficientStatistics.from_dataframe(self.data.iloc[np.sort(block)], self.categorical_vars)
+                for block in np.array_split(rows, self.n_blocks)]
+
+    def _aggregate(self, results):
+        edge_counts = {}
+        arrow_counts = {}
+        for arrows in results:
+            for (v_a, v_b, orientation) in arrows:
+                edge_counts[v_a, v_b] = edge_counts.get((v_a, v_b), 0) + 1
+                if orientation == v_b:
+                    arrow_counts[v_a, v_b] = arrow_counts.get((v_a, v_b), 0) + 1
+                elif orientation == v_a:
+                    arrow_counts[v_b, v_a] = arrow_counts.get((v_b, v_a), 0) + 1
+
+        self.edge_frequencies = {edge: count / self.n_resamples for edge, count in edge_counts.items()}
+        self.orientation_frequencies = {arrow: count / self.n_resamples for arrow, count in arrow_counts.items()}
+
+        self.graph = Graph()
+        for v in self.data.columns:
+            self.graph.add_node(v)
+        for (v_a, v_b), count in edge_counts.items():
+            if count < self.threshold * self.n_resamples:
+                continue
+            self.graph.add_edge(v_a, v_b)
+            for (source, target) in [(v_a, v_b), (v_b, v_a)]:
+                if arrow_counts.get((source, target), 0) >= self.threshold * count > arrow_counts.get((target, source), 0):
+                    self.graph.set_edge_orientation(source, target)
+
+
+def _infer_resample(task, data, independence_test):
+    """
+    Run the inference on one resample of the data: a draw of blocks if the data is
+    a list of statistics of blocks, else a draw of rows
+
+    Returns:
+        list of the edges found, as (v_a, v_b, orientation) tuples
+    """
+    (method, fraction, seed, categorical_vars, options) = task
+    rng = np.random.default_rng(seed)
+    bootstrap = method == 'bootstrap'
+    size = len(data) if bootstrap else max(1, int(round(fraction * len(data))))
+
+    if isinstance(data, list):
+        sample = SufficientStatistics(data[0].columns, data[0].categorical_vars)
+        for i in rng.choice(len(data), size, replace=bootstrap):
+            sample.merge(data[i])
+    else:
+        sample = data.iloc[np.sort(rng.choice(len(data), size, replace=bootstrap))]
+
+    inference = IC_star(sample, independence_test, categorical_vars=categorical_vars, **options)
+    return [(v_a, v_b, inference.graph.get_edge_orientation(v_a, v_b)) for (v_a, v_b) in inference.graph.edges()]
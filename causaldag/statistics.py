@@ -0,0 +1,213 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+
+class SufficientStatistics():
+    """
+    Sufficient statistics of a dataset, accumulated in a single pass over chunks of rows,
+    so that independence tests can run on data that does not fit in memory.
+    
+    For the continuous variables, the means and the matrix of centered cross-products are kept
+    (from which covariances, correlations and Gram matrices follow). For the categorical 
+    variables, the number of rows of each observed combination of values is kept.
+    
+    Attributes:
+        columns (list of str): all the variables
+        categorical_vars (list of str): categorical variables
+        continuous_vars (list of str): continuous variables
+        n (int): number of rows
+    """
+    def __init__(self, columns, categorical_vars=None):
+        """
+        Parameters:
+            columns (list of str): variables of the dataset
+            categorical_vars (list of str): list of categorical variables
+        """
+        self.columns = list(columns)
+        if categorical_vars is None:
+            self.categorical_vars = []
+        else:
+            self.categorical_vars = [v for v in self.columns if v in categorical_vars]
+        self.continuous_vars = [v for v in self.columns if v not in self.categorical_vars]
+        self.n = 0
+        
+        k = len(self.continuous_vars)
+        self._mean = np.zeros(k)
+        self._comoment = np.zeros((k, k))
+        self._counts = None
+        self._count_tables = {}
+        
+    @classmethod
+    def from_dataframe(cls, data, categorical_vars=None):
+        """
+        Compute the statistics of an in-memory pandas.DataFrame
+        """
+        statistics = cls(data.columns, categorical_vars)
+        statistics.update(data)
+        return statistics
+    
+    @classmethod
+    def from_chunks(cls, chunks, categorical_vars=None):
+        """
+        Accumulate the statistics over an iterable of pandas.DataFrame with the same columns
+        """
+        statistics = None
+        for chunk in chunks:
+            if statistics is None:
+                statistics = cls(chunk.columns, categorical_vars)
+            statistics.update(chunk)
+        if statistics is None:
+            raise ValueError('No data to compute the statistics from')
+        return statistics
+    
+    @classmethod
+    def from_csv(cls, path, categorical_vars=None, chunksize=1000000, **kwargs):
+        """
+        Stream a CSV file by chunks of `chunksize` rows. Other arguments go to pandas.read_csv
+        """
+        return cls.from_chunks(pd.read_csv(path, chunksize=chunksize, **kwargs), categorical_vars)
+    
+    @classmethod
+    def from_parquet(cls, path, categorical_vars=None, batch_size=1000000, columns=None):
+        """
+        Stream a Parquet file by batches of `batch_size` rows. Requires pyarrow
+        """
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('Reading Parquet files requires pyarrow')
+        
+        batches = pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns)
+        return cls.from_chunks((batch.to_pandas() for batch in batches), categorical_vars)
+    
+    @classmethod
+    def from_array(cls, array, columns, categorical_vars=None, chunksize=1000000):
+        """
+        Read a 2-dimensional array by chunks of `chunksize` rows. With a numpy.memmap,
+        only one chunk at a time is loaded in memory
+        """
+        chunks = (pd.DataFrame(array[i:i+chunksize], columns=columns) for i in range(0, len(array), chunksize))
+        return cls.from_chunks(chunks, categorical_vars)
+        
+    def update(self, chunk):
+        """
+        Add the rows of a pandas.DataFrame to the statistics
+        """
+        n = len(chunk)
+        if n == 0:
+            return
+        
+        if len(self.continuous_vars) > 0:
+            values = chunk[self.continuous_vars].to_numpy(dtype=float)
+            mean = values.mean(axis=0)
+            centered = values - mean
+            self._merge_moments(n, mean, centered.T @ centered)
+        else:
+            self.n += n
+        
+        if len(self.categorical_vars) > 0:
+            counts = chunk.groupby(self.categorical_vars, observed=True, dropna=False).size()
+            self._merge_counts(counts)
+            
+    def merge(self, other):
+        """
+        Add the statistics of another part of the same dataset
+        """
+        if other.columns != self.columns or other.categorical_vars != self.categorical_vars:
+            raise ValueError('Statistics of different variables cannot be merged')
+        if other.n == 0:
+            return
+        
+        if len(self.continuous_vars) > 0:
+            self._merge_moments(other.n, other._mean, other._comoment)
+        else:
+            self.n += other.n
+        if other._counts is not None:
+            self._merge_counts(other._counts)
+    
+    def _merge_moments(self, n, mean, comoment):
+        # Pairwise update of the means and centered cross-products (Chan, Golub and LeVeque, 1979)
+        total = self.n + n
+        delta = mean - self._mean
+        self._comoment = self._comoment + comoment + np.outer(delta, delta) * self.n * n / total
+        self._mean = self._mean + delta * n / total
+        self.n = total
+        
+    def _merge_counts(self, counts):
+        if self._counts is None:
+            self._counts = counts
+        else:
+            self._counts = self._counts.add(counts, fill_value=0).astype('int64')
+        self._count_tables = {}
+        
+    def mean(self):
+        """
+        Returns:
+            pandas.Series: mean of the continuous variables
+        """
+        return pd.Series(self._mean, index=self.continuous_vars)
+    
+    def covariance(self):
+        """
+        Returns:
+            pandas.DataFrame: covariance matrix of the continuous variables
+        """
+        return pd.DataFrame(self._comoment / (self.n - 1), index=self.continuous_vars, columns=self.continuous_vars)
+    
+    def correlation(self):
+        """
+        Returns:
+            pandas.DataFrame: correlation matrix of the continuous variables
+        """
+        standard_deviations = np.sqrt(np.diag(self._comoment))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = self._comoment / np.outer(standard_deviations, standard_deviations)
+        return pd.DataFrame(correlation, index=self.continuous_vars, columns=self.continuous_vars)
+    
+    def gram(self):
+        """
+        Returns:
+            pandas.DataFrame: uncentered cross-products X'X of the continuous variables
+        """
+        gram = self._comoment + self.n * np.outer(self._mean, self._mean)
+        return pd.DataFrame(gram, index=self.continuous_vars, columns=self.continuous_vars)
+    
+    def count_table(self, columns):
+        """
+        Number of rows of each observed combination of values of some categorical variables
+        
+        Params:
+            columns (list of str): categorical variables
+            
+        Returns:
+            pandas.Series: counts indexed by the combinations of values
+        """
+        columns = tuple(columns)
+        if any(v not in self.categorical_vars for v in columns):
+            raise ValueError('Count tables are only kept for the categorical variables')
+        
+        if columns not in self._count_tables:
+            if len(columns) == 0:
+                self._count_tables[columns] = pd.Series([self.n])
+            else:
+                self._count_tables[columns] = self._counts.groupby(level=list(columns), observed=True, 
+                                                                   dropna=False).sum()
+        return self._count_tables[columns]
+    
+    def fingerprint(self):
+        """
+        Hash of the statistics, to identify the dataset they were computed from
+        """
+        digest = hashlib.sha1(repr((self.columns, self.categorical_vars, self.n)).encode())
+        digest.update(self._mean.tobytes())
+        digest.update(self._comoment.tobytes())
+        if self._counts is not None:
+            digest.update(pd.util.hash_pandas_object(self._counts, index=True).to_numpy().tobytes())
+        return digest.hexdigest()
+    
+    def __getstate__(self):
+        # Marginal count tables are recomputed on demand
+        state = self.__dict__.copy()
+        state['_count_tables'] = {}
+        return state
@@ -1,5 +1,10 @@
+import itertools
 from .utils import get_all_possible_sets
-from .graphs import Path
+from .executors import SerialExecutor
+from .instrumentation import Instrumentation
+
+# Number of implications handed to the executor at once
+BATCH_SIZE = 1024
 
 class Implications():
     """
@@ -12,15 +17,32 @@ class Implications():
         strong_contradictions: the graph implied no dependence between two variables 
             but the test found statistically-significant dependance
     """
-    def __init__(self, graph, data, independence_test, categorical_vars=None):
+    def __init__(self, graph, data, independence_test, categorical_vars=None, basis='all', executor=None, 
+                 instrumentation=None):
         """
         Parameters:
             graph (CausalDAG object): user-provided DAG
-            data (pandas.DataFrame): data to infer a causal diagram from
+            data (pandas.DataFrame or SufficientStatistics): data to infer a causal diagram from
             independence_test (test object): method for testing independence between variables
             categorical_vars (list of str): list of categorical variables
+            basis (str): which testable implications to check against the data
+                'all' (default): every pair of variables given every subset of the other variables
+                'local_markov': every variable is independent of each of its non-adjacent
+                    predecessors in a topological order given its parents
+                'minimal': every non-adjacent pair of variables given one minimal separating set
+                The last two need a number of tests quadratic in the number of variables, but are
+                weaker checks than 'all': they test one pair of variables at a time, and pairwise
+                independencies do not imply the joint ones (e.g. with a -> c <- b, c -> d and
+                d = a XOR b, all the pairwise statements hold but a and d are dependent given b and c)
+            executor (executor object): how to run the independence tests, e.g. on a pool of 
+                processes (see causaldag.executors). Default runs them serially
+            instrumentation (Instrumentation object): collects timings and counters of the run 
+                and reports progress (see causaldag.instrumentation). A new one is created by default
         """
         
+        if basis not in ('all', 'local_markov', 'minimal'):
+            raise ValueError('Wrong input: `basis` expects one of "all", "local_markov" or "minimal"')
+        
         self.graph = graph
         self.data = data
         if categorical_vars is None:
@@ -28,55 +50,90 @@ class Implications():
         else:
             self.categorical_vars = categorical_vars
         self.independence_test = independence_test
+        self.basis = basis
+        if executor is None:
+            self.executor = SerialExecutor()
+        else:
+            self.executor = executor
+        if instrumentation is None:
+            self.instrumentation = Instrumentation()
+        else:
+            self.instrumentation = instrumentation
         
-        # Step 1: Generate all testable implications
-        self.implications = self._generate_testable_implications()
-        
+        # Step 1: Lazily generate the testable implications
         # Step 2: For each implication, test if True
-        self._check_implications_against_data()
-        
+        self.implications = []
+        self.instrumentation.watch_cache(self.independence_test)
+        with self.instrumentation.phase_timer('testing'):
+            self._check_implications_against_data()
         
     def _generate_testable_implications(self):
-        independence_implications = []
+        """
+        Yield the testable implications (x, y, z, independence_flag) of the graph for the basis
+        """
+        if self.basis == 'local_markov':
+            return self._generate_local_markov_implications()
+        elif self.basis == 'minimal':
+            return self._generate_minimal_implications()
+        return self._generate_all_implications()
         
+    def _generate_all_implications(self):
+        # The d-separation queries are answered by batches from a precomputed index of the graph
+        index = self.graph.freeze()
+        queries = ((v_a, v_b, z) for (v_a, v_b) in get_all_possible_sets(self.graph.nodes(), 2)
+                   # All possible combinations of the nodes that can be controlled
+                   for z in get_all_possible_sets([n for n in self.graph.nodes() if n not in [v_a, v_b]], 
+                                                  include_empty=True))
+        
+        while True:
+            batch = list(itertools.islice(queries, BATCH_SIZE))
+            if len(batch) == 0:
+                break
+            for (v_a, v_b, z), separated in zip(batch, index.is_dseparated_many(batch)):
+                yield (v_a, v_b, list(z), bool(separated))
+                    
+    def _generate_local_markov_implications(self):
+        order = self.graph.get_topological_order()
+        
+        for i, v in enumerate(order):
+            parents = self.graph.get_predecessors(v)
+            for u in order[:i]:
+                if u not in parents:
+                    yield (u, v, list(parents), True)
+                    
+    def _generate_minimal_implications(self):
         for (v_a, v_b) in get_all_possible_sets(self.graph.nodes(), 2):
             
-            # Get all paths between v_a and v_b
-            paths = [Path(nodes=p, graph=self.graph) for p in self.graph.get_all_paths(v_a, v_b)]
-            
-            # Get all nodes that can be controlled
-            control_nodes = [n for n in self.graph.nodes() if n not in [v_a, v_b]]
-            
-            # All possible combinations of nodes
-            z_sets = get_all_possible_sets(control_nodes, include_empty=True)
-            
-            for z in z_sets:
-                # if Z d-separates all the possible paths, then it d-separate v_a and v_b
-                if all([p.is_dseparated(z) for p in paths]):
-                    independence_implications.append((v_a, v_b, list(z), True))
-                else:
-                    independence_implications.append((v_a, v_b, list(z), False))
-                    
-        return independence_implications
+            z = next(self.graph.minimal_dseparators(v_a, v_b), None)
+            # Adjacent nodes cannot be separated
+            if z is not None:
+                yield (v_a, v_b, list(z), True)
     
     def _check_implications_against_data(self):
         self.agreements = []
         self.weak_contradictions = []
         self.strong_contradictions = []
         
-        for (x, y, z, independence_flag) in self.implications:
-            
-            if y in self.categorical_vars:
-                categorical_outcome=True
-            else:
-                categorical_outcome=False
+        implications = self._generate_testable_implications()
+        
+        while True:
+            batch = list(itertools.islice(implications, BATCH_SIZE))
+            if len(batch) == 0:
+                break
+            self.implications.extend(batch)
             
-            self.independence_test.fit([x], y, z, categorical_outcome=categorical_outcome, data=self.data)
-            test_result = self.independence_test.is_independent()
+            queries = [([x], y, z, y in self.categorical_vars) for (x, y, z, _) in batch]
+            results = self.executor.map_tests(self.independence_test, self.data, queries,
+                                              callback=self.instrumentation.record_tests)
             
-            if test_result == independence_flag:
-                self.agreements.append((x, y, z, independence_flag))
-            elif test_result is True:
-                self.weak_contradictions.append((x, y, z, independence_flag))
-            elif test_result is False:
-                self.strong_contradictions.append((x, y, z, independence_flag))
\ No newline at end of file
+            for (x, y, z, independence_flag), result in zip(batch, results):
+                test_result = result.independent
+                
+                if test_result == independence_flag:
+                    self.agreements.append((x, y, z, independence_flag))
+                elif test_result is True:
+                    self.weak_contradictions.append((x, y, z, independence_flag))
+                elif test_result is False:
+                    self.strong_contradictions.append((x, y, z, independence_flag))
+                    
+            self.instrumentation.progress(implications_done=len(self.implications))
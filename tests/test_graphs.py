@@ -0,0 +1,195 @@
+"""
+Brute-force checks of the d-separation and adjustment set algorithms on small random DAGs
+"""
+import itertools
+import random
+import numpy as np
+import pytest
+from causaldag import CausalDAG
+from causaldag.graphs import Path
+
+nx = pytest.importorskip('networkx')
+
+SEEDS = range(30)
+
+
+def random_dag(seed, n_nodes=7, density=0.35):
+    rng = random.Random(seed)
+    nodes = ['v{}'.format(i) for i in range(n_nodes)]
+    rng.shuffle(nodes)
+    dag = CausalDAG()
+    for v in nodes:
+        dag.add_node(v)
+    for i, j in itertools.combinations(range(n_nodes), 2):
+        if rng.random() < density:
+            dag.add_edge(nodes[i], nodes[j])
+    return dag
+
+
+def to_networkx(dag, remove_out_edges_of=None):
+    graph = nx.DiGraph()
+    graph.add_nodes_from(dag.nodes())
+    graph.add_edges_from((v_a, v_b) for v_a in dag.nodes() for v_b in dag.get_successors(v_a) 
+                         if v_a != remove_out_edges_of)
+    return graph
+
+
+def subsets(nodes):
+    return (set(z) for q in range(len(nodes)+1) for z in itertools.combinations(nodes, q))
+
+
+def valid_adjustment_sets(dag, v_a, v_b):
+    """
+    All the sets of non-descendants of X that d-separate X and Y once the arrows out of X are removed
+    """
+    graph = to_networkx(dag, remove_out_edges_of=v_a)
+    descendants = set(dag.get_descendants(v_a))
+    candidates = [v for v in dag.nodes() if v not in descendants and v not in (v_a, v_b)]
+    return [z for z in subsets(candidates) if nx.is_d_separator(graph, {v_a}, {v_b}, z)]
+
+
+def ordered_pairs(dag):
+    return [(v_a, v_b) for v_a in dag.nodes() for v_b in dag.nodes() if v_a != v_b]
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_is_dseparated(seed):
+    dag = random_dag(seed)
+    graph = to_networkx(dag)
+    index = dag.freeze()
+    queries = []
+    for (v_a, v_b) in ordered_pairs(dag):
+        for z in subsets([v for v in dag.nodes() if v not in (v_a, v_b)]):
+            queries.append((v_a, v_b, sorted(z)))
+    
+    expected = [nx.is_d_separator(graph, {v_a}, {v_b}, set(z)) for (v_a, v_b, z) in queries]
+    assert [dag.is_dseparated(v_a, v_b, z) for (v_a, v_b, z) in queries] == expected
+    assert index.is_dseparated_many(queries).tolist() == expected
+
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_index_accepts_any_z(seed):
+    dag = random_dag(seed)
+    index = dag.freeze()
+    queries = []
+    for (v_a, v_b) in ordered_pairs(dag):
+        queries += [(v_a, v_b, None), (v_a, v_b, [])]
+        queries += [(v_a, v_b, v) for v in dag.nodes() if v not in (v_a, v_b)]
+    
+    expected = [dag.is_dseparated(v_a, v_b, z) for (v_a, v_b, z) in queries]
+    assert [index.is_dseparated(v_a, v_b, z) for (v_a, v_b, z) in queries] == expected
+    assert index.is_dseparated_many(queries).tolist() == expected
+
+def test_path_collider_with_conditioned_descendant():
+    dag = CausalDAG()
+    for (v_a, v_b) in [('a', 'c'), ('b', 'c'), ('c', 'd')]:
+        dag.add_edge(v_a, v_b)
+    path = Path(['a', 'c', 'b'], dag)
+    assert path.is_dseparated()
+    assert not path.is_dseparated(['c'])
+    # Conditioning on a descendant of the collider opens it too
+    assert not path.is_dseparated(['d'])
+    assert not dag.is_dseparated('a', 'b', ['d'])
+
+
+@pytest.mark.parametrize('seed', SEEDS[:10])
+def test_paths_agree_with_graph(seed):
+    dag = random_dag(seed, n_nodes=6)
+    for (v_a, v_b) in itertools.combinations(dag.nodes(), 2):
+        paths = [Path(path, dag) for path in dag.iter_paths(v_a, v_b)]
+        for z in subsets([v for v in dag.nodes() if v not in (v_a, v_b)]):
+            assert all(path.is_dseparated(z) for path in paths) == dag.is_dseparated(v_a, v_b, z)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_minimal_dseparators(seed):
+    dag = random_dag(seed)
+    graph = to_networkx(dag)
+    for (v_a, v_b) in itertools.combinations(dag.nodes(), 2):
+        separators = [z for z in subsets([v for v in dag.nodes() if v not in (v_a, v_b)])
+                      if nx.is_d_separator(graph, {v_a}, {v_b}, z)]
+        minimal = [z for z in separators if not any(other < z for other in separators)]
+        
+        found = [set(z) for z in dag.minimal_dseparators(v_a, v_b)]
+        assert len(found) == len(set(map(frozenset, found)))
+        assert sorted(map(sorted, found)) == sorted(map(sorted, minimal))
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_minimal_adjustment_sets(seed):
+    dag = random_dag(seed)
+    for (v_a, v_b) in ordered_pairs(dag):
+        valid = valid_adjustment_sets(dag, v_a, v_b)
+        minimal = [z for z in valid if not any(other < z for other in valid)]
+        
+        found = [set(z) for z in dag.minimal_adjustment_sets(v_a, v_b)]
+        assert sorted(map(sorted, found)) == sorted(map(sorted, minimal))
+        for z in subsets([v for v in dag.nodes() if v != v_b]):
+            assert dag.is_backdoor_set(v_a, v_b, z) == (z in valid)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_minimum_cost_adjustment_set(seed):
+    dag = random_dag(seed)
+    rng = random.Random(seed)
+    costs = {v: rng.randint(1, 5) for v in dag.nodes()}
+    for (v_a, v_b) in ordered_pairs(dag):
+        valid = valid_adjustment_sets(dag, v_a, v_b)
+        for weights in (None, costs):
+            z = dag.minimum_cost_adjustment_set(v_a, v_b, costs=weights)
+            if len(valid) == 0:
+                assert z is None
+                continue
+            cost = lambda z: sum((weights or {}).get(v, 1) for v in z)
+            assert set(z) in valid
+            assert cost(z) == min(cost(other) for other in valid)
+
+
+def covariance(dag, seed):
+    """
+    Covariance of a linear structural equation model over `dag` with unit noise variances
+    """
+    rng = np.random.default_rng(seed)
+    nodes = dag.nodes()
+    index = {v: i for i, v in enumerate(nodes)}
+    weights = np.zeros((len(nodes), len(nodes)))
+    for v in nodes:
+        for parent in dag.get_predecessors(v):
+            weights[index[v], index[parent]] = rng.uniform(0.5, 1.5) * rng.choice([-1, 1])
+    mixing = np.linalg.inv(np.eye(len(nodes)) - weights)
+    return mixing @ mixing.T, index
+
+
+def asymptotic_variance(sigma, index, v_a, v_b, z):
+    """
+    Asymptotic variance of the coefficient of X in the regression of Y on X and Z:
+    residual variance of Y given X, Z over residual variance of X given Z
+    """
+    def residual_variance(target, given):
+        given = [index[v] for v in given]
+        t = index[target]
+        if len(given) == 0:
+            return sigma[t, t]
+        return sigma[t, t] - sigma[t, given] @ np.linalg.solve(sigma[np.ix_(given, given)], sigma[given, t])
+    return residual_variance(v_b, [v_a] + sorted(z)) / residual_variance(v_a, sorted(z))
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_optimal_adjustment_set(seed):
+    dag = random_dag(seed)
+    sigma, index = covariance(dag, seed)
+    for (v_a, v_b) in ordered_pairs(dag):
+        valid = valid_adjustment_sets(dag, v_a, v_b)
+        z = dag.optimal_adjustment_set(v_a, v_b)
+        if len(valid) == 0:
+            assert z is None
+            continue
+        assert set(z) in valid
+        
+        # With causal paths from X to Y, no valid set gives a smaller variance
+        if v_b in dag.get_descendants(v_a):
+            variances = [asymptotic_variance(sigma, index, v_a, v_b, other) for other in valid]
+            assert asymptotic_variance(sigma, index, v_a, v_b, z) <= min(variances) * (1 + 1e-9)
+        else:
+            assert len(z) == min(len(other) for other in valid)
@@ -0,0 +1,231 @@
+"""
+Checks of the independence tests against reference implementations and of their use by IC_star
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from causaldag import IC_star, RobustLinearTest, ThreadPoolExecutor
+
+
+def linear_data(seed, n=1000):
+    rng = np.random.default_rng(seed)
+    a = rng.standard_t(3, size=n)
+    b = a + rng.standard_t(3, size=n)
+    c = a - b + rng.standard_t(3, size=n)
+    d = c + rng.standard_t(3, size=n)
+    e = rng.standard_t(3, size=n)
+    return pd.DataFrame({'a': a, 'b': b, 'c': c, 'd': d, 'e': e})
+
+
+def summary(inference):
+    return (sorted((v_a, v_b, inference.graph.get_edge_orientation(v_a, v_b)) for (v_a, v_b) in inference.graph.edges()),
+            inference.conditioning_sets, inference.weakest_tests)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_robust_linear_threads(seed):
+    data = linear_data(seed)
+    serial = IC_star(data, RobustLinearTest())
+    with ThreadPoolExecutor(4) as executor:
+        threaded = IC_star(data, RobustLinearTest(), executor=executor)
+    assert summary(threaded) == summary(serial)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_robust_linear_warm_start(seed):
+    data = linear_data(seed)
+    queries = [(['a'], 'b', []), (['a'], 'd', ['c']), (['b'], 'd', ['a', 'c']), (['e'], 'c', ['a', 'b'])]
+    warm, cold = RobustLinearTest(), RobustLinearTest(warm_start=False)
+    for (x, y, z) in queries + list(reversed(queries)):
+        result, expected = warm.test(x, y, z, data), cold.test(x, y, z, data)
+        assert result.independent == expected.independent
+        np.testing.assert_allclose(result.statistic, expected.statistic, rtol=1e-5, atol=1e-8)
+
+
+def categorical_data(seed, n=2000):
+    rng = np.random.default_rng(seed)
+    z = rng.integers(0, 3, size=n)
+    x = (z + rng.integers(0, 2, size=n)) % 3
+    y = (z + rng.integers(0, 3, size=n) * (rng.random(n) < 0.5)) % 4
+    w = (x + rng.integers(0, 2, size=n)) % 2
+    return pd.DataFrame({'x': x, 'y': y, 'z': z, 'w': w})
+
+
+def reference_g_test(data, x, y, z, pearson):
+    """
+    Sum of the statistics and degrees of freedom of the contingency tables of each stratum of z
+    """
+    from scipy import stats
+    strata = data.groupby(z) if len(z) > 0 else [(None, data)]
+    statistic, degrees_of_freedom = 0., 0
+    for _, stratum in strata:
+        table = pd.crosstab(stratum[x], stratum[y]).to_numpy()
+        if min(table.shape) < 2:
+            continue
+        chi2, _, dof, _ = stats.chi2_contingency(table, correction=False, lambda_=None if pearson else 'log-likelihood')
+        statistic += chi2
+        degrees_of_freedom += dof
+    pvalue = stats.chi2.sf(statistic, degrees_of_freedom) if degrees_of_freedom > 0 else 1.
+    return statistic, pvalue
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('pearson', [False, True])
+def test_g_test(seed, pearson):
+    from causaldag import GTest
+    data = categorical_data(seed)
+    test = GTest(pearson=pearson)
+    for (x, y, z) in [('x', 'y', []), ('x', 'y', ['z']), ('w', 'y', ['x']), ('w', 'z', ['x', 'y']), ('y', 'x', ['w', 'z'])]:
+        result = test.test([x], y, z, data)
+        statistic, pvalue = reference_g_test(data, x, y, z, pearson)
+        np.testing.assert_allclose(result.statistic, statistic, rtol=1e-8, atol=1e-8)
+        np.testing.assert_allclose(result.pvalue, pvalue, rtol=1e-8, atol=1e-12)
+        assert result.independent == (pvalue > test.alpha)
+
+
+def partial_correlation(data, x, y, z):
+    """
+    Correlation of the residuals of x and y after least squares regression on z and a constant
+    """
+    design = np.column_stack([data[z].to_numpy(), np.ones(len(data))])
+    residuals = [data[v].to_numpy() - design @ np.linalg.lstsq(design, data[v].to_numpy(), rcond=None)[0] for v in (x, y)]
+    return np.corrcoef(*residuals)[0, 1]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_fisher_z(seed):
+    from scipy import stats
+    from causaldag import FisherZTest, SufficientStatistics
+    data = linear_data(seed)
+    test = FisherZTest()
+    for (x, y, z) in [('a', 'b', []), ('a', 'd', ['c']), ('b', 'd', ['a', 'c']), ('e', 'c', ['a', 'b']), ('d', 'a', ['b', 'c', 'e'])]:
+        result = test.test([x], y, z, data)
+        r = partial_correlation(data, x, y, z)
+        pvalue = 2 * stats.norm.sf(abs(np.arctanh(r)) * np.sqrt(len(data) - len(z) - 3))
+        np.testing.assert_allclose(result.statistic, r, rtol=1e-8, atol=1e-10)
+        np.testing.assert_allclose(result.pvalue, pvalue, rtol=1e-6, atol=1e-12)
+        assert result.independent == (pvalue > test.alpha)
+        assert result.lower <= r <= result.upper
+        
+        # The same test on the statistics of the data, and with the treatment variables swapped
+        assert FisherZTest().test([x], y, z, SufficientStatistics.from_dataframe(data)) == pytest.approx(result)
+        assert test.test([y], x, z, data) == pytest.approx(result)
+
+
+@pytest.mark.parametrize('spending', ['obrien_fleming', 'pocock', 'bonferroni'])
+def test_sequential_spending(spending):
+    from causaldag import FisherZTest, SequentialTest
+    test = SequentialTest(FisherZTest(alpha=0.05), initial_size=1000, growth=4, spending=spending)
+    sizes = test._get_sizes(100000)
+    assert sizes == [1000, 4000, 16000, 64000, 100000]
+    
+    spent = [test._spend(size / sizes[-1], stage + 1, len(sizes)) for stage, size in enumerate(sizes)]
+    # The whole significance level is spent on all the rows, a bit more at each stage
+    assert spent[-1] == pytest.approx(0.05)
+    assert all(0 <= a < b for a, b in zip(spent, spent[1:]))
+    if spending == 'obrien_fleming':
+        # Very little is spent on the first stages
+        assert spent[0] < 1e-6
+
+
+def test_sequential_early_stop():
+    from causaldag import FisherZTest, SequentialTest
+    rng = np.random.default_rng(0)
+    n = 50000
+    x = rng.normal(size=n)
+    data = pd.DataFrame({'x': x, 'y': x + rng.normal(size=n), 'z': rng.normal(size=n)})
+    test = SequentialTest(FisherZTest(), initial_size=1000)
+    
+    # Clear dependence is decided on the first stage, independence needs all the stages
+    assert not test.test(['x'], 'y', [], data).independent
+    assert test.rows_tested == 1000
+    assert test.test(['x'], 'z', [], data).independent
+    assert test.rows_tested == 1000 + sum(test._get_sizes(n))
+    # Each stage size keeps its own copy of the wrapped test
+    assert sorted(test._tests) == test._get_sizes(n)[:-1]
+
+
+def test_sequential_type_one_error():
+    from causaldag import FisherZTest, SequentialTest
+    rng = np.random.default_rng(0)
+    n_repeats, n = 400, 4000
+    rejections = 0
+    for seed in range(n_repeats):
+        data = pd.DataFrame(rng.normal(size=(n, 2)), columns=['x', 'y'])
+        test = SequentialTest(FisherZTest(alpha=0.05), initial_size=250, seed=seed)
+        rejections += not test.test(['x'], 'y', [], data).independent
+    # Within three standard errors of the significance level
+    assert abs(rejections / n_repeats - 0.05) < 3 * np.sqrt(0.05 * 0.95 / n_repeats)
+
+
+def test_random_features_detect_nonlinear_dependence():
+    from causaldag import RandomFeatureTest, FisherZTest
+    rng = np.random.default_rng(0)
+    n = 2000
+    x = rng.normal(size=n)
+    z = rng.normal(size=n)
+    data = pd.DataFrame({'x': x, 'y': x**2 + 0.5 * rng.normal(size=n), 'z': z, 'w': np.cos(2 * z) + 0.3 * rng.normal(size=n)})
+    test = RandomFeatureTest()
+    
+    # x and y are uncorrelated but dependent
+    assert abs(FisherZTest().test(['x'], 'y', [], data).statistic) < 0.1
+    assert not test.test(['x'], 'y', [], data).independent
+    assert not test.test(['w'], 'z', [], data).independent
+    assert test.test(['x'], 'z', [], data).independent
+    # Sorting the rows changes neither the bandwidths nor the decisions
+    ordered = data.sort_values('x').reset_index(drop=True)
+    assert not RandomFeatureTest().test(['x'], 'y', [], ordered).independent
+
+
+def test_random_features_type_one_error():
+    from causaldag import RandomFeatureTest
+    rng = np.random.default_rng(1)
+    n_repeats, n = 200, 500
+    rejections = 0
+    for seed in range(n_repeats):
+        # x and y both depend non-linearly on z, and are independent given z
+        z = rng.normal(size=n)
+        data = pd.DataFrame({'x': np.sin(2 * z) + 0.3 * rng.normal(size=n), 
+                             'y': np.cos(2 * z) + 0.3 * rng.normal(size=n), 'z': z})
+        rejections += not RandomFeatureTest(seed=seed).test(['x'], 'y', ['z'], data).independent
+    assert abs(rejections / n_repeats - 0.05) < 3 * np.sqrt(0.05 * 0.95 / n_repeats)
+
+
+def test_random_features_symmetric_and_picklable():
+    import pickle
+    from causaldag import RandomFeatureTest
+    data = linear_data(0)
+    test = RandomFeatureTest()
+    result = test.test(['a'], 'd', ['c'], data)
+    assert test.test(['d'], 'a', ['c'], data).pvalue == pytest.approx(result.pvalue, rel=1e-5)
+    assert pickle.loads(pickle.dumps(test)).test(['a'], 'd', ['c'], data).pvalue == pytest.approx(result.pvalue, rel=1e-9)
+
+
+class ConstantTest():
+    symmetric = True
+
+    def get_params(self):
+        return {}
+
+    def test(self, x, y, z, data, categorical_outcome=False):
+        from causaldag.independence import IndependenceTestResult
+        return IndependenceTestResult(True, 0., 1., None, None)
+
+
+def test_cached_counters_threads():
+    import sys
+    from concurrent.futures import ThreadPoolExecutor as Pool
+    from causaldag import CachedIndependenceTest
+    data = linear_data(0, n=10)
+    queries = [(['a'], 'b', []), (['b'], 'a', []), (['a'], 'c', ['b']), (['c'], 'a', ['b'])] * 500
+    cached = CachedIndependenceTest(ConstantTest(), maxsize=1)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with Pool(8) as pool:
+            results = list(pool.map(lambda query: cached.test(*query, data), queries))
+    finally:
+        sys.setswitchinterval(interval)
+    assert all(result.independent for result in results)
+    assert cached.hits + cached.misses == len(queries)
+    assert cached.misses >= 2
@@ -0,0 +1,114 @@
+"""
+Checks of the orientation rules of IC_star against brute force
+"""
+import itertools
+import pytest
+from causaldag import Graph, IC_star
+from .test_graphs import random_dag
+
+SEEDS = range(40)
+
+
+def pattern(dag):
+    """
+    Skeleton of the DAG with only its v-structures a -> c <- b (a and b nonadjacent) oriented
+    """
+    graph = Graph()
+    for v in dag.nodes():
+        graph.add_node(v)
+    for (v_a, v_b) in dag.edges():
+        graph.add_edge(v_a, v_b)
+    for v_c in dag.nodes():
+        for v_a, v_b in itertools.combinations(dag.get_predecessors(v_c), 2):
+            if v_b not in dag.get_neighbors(v_a):
+                graph.set_edge_orientation(v_a, v_c)
+                graph.set_edge_orientation(v_b, v_c)
+    return graph
+
+
+def arrows(graph):
+    arrows = set()
+    for (v_a, v_b) in graph.edges():
+        orientation = graph.get_edge_orientation(v_a, v_b)
+        if orientation is not None:
+            arrows.add((v_a, v_b) if orientation == v_b else (v_b, v_a))
+    return arrows
+
+
+def orient(graph):
+    inference = IC_star.__new__(IC_star)
+    inference.graph = graph.copy()
+    inference._apply_recursion_rules()
+    return arrows(inference.graph)
+
+
+def brute_force_fixpoint(graph):
+    """
+    Apply rules 1 to 3 to every undirected edge until none applies
+    """
+    graph = graph.copy()
+    
+    def arrow(v_a, v_b):
+        return graph.get_edge_orientation(v_a, v_b) == v_b
+    
+    def undirected(v_a, v_b):
+        return v_b in graph.get_neighbors(v_a) and graph.get_edge_orientation(v_a, v_b) is None
+    
+    def directed_path(v_a, v_b):
+        to_visit, reached = [v_a], set()
+        while to_visit:
+            for n in graph.get_successors(to_visit.pop()):
+                if n not in reached:
+                    reached.add(n)
+                    to_visit.append(n)
+        return v_b in reached
+    
+    nodes = graph.nodes()
+    changed = True
+    while changed:
+        changed = False
+        for v_a, v_b in itertools.permutations(nodes, 2):
+            if not undirected(v_a, v_b):
+                continue
+            # Rule 1: c -> a - b with c and b nonadjacent
+            rule_1 = any(arrow(v_c, v_a) and v_c not in graph.get_neighbors(v_b) for v_c in nodes if v_c != v_b)
+            # Rule 2: directed path from a to b
+            rule_2 = directed_path(v_a, v_b)
+            # Rule 3: a - c -> b and a - d -> b, with c and d nonadjacent
+            rule_3 = any(undirected(v_a, v_c) and undirected(v_a, v_d) and arrow(v_c, v_b) and arrow(v_d, v_b)
+                         and v_d not in graph.get_neighbors(v_c) for v_c, v_d in itertools.combinations(nodes, 2))
+            if rule_1 or rule_2 or rule_3:
+                graph.set_edge_orientation(v_a, v_b)
+                changed = True
+    return arrows(graph)
+
+
+def essential_arrows(dag):
+    """
+    Arrows shared by all the DAGs with the same skeleton and v-structures as `dag`
+    """
+    edges = dag.edges()
+    reference = pattern(dag)
+    shared = None
+    for orientations in itertools.product([False, True], repeat=len(edges)):
+        graph = Graph()
+        for v in dag.nodes():
+            graph.add_node(v)
+        for (v_a, v_b), flip in zip(edges, orientations):
+            graph.add_edge(v_a, v_b)
+            graph.set_edge_orientation(*((v_b, v_a) if flip else (v_a, v_b)))
+        if any(v in graph.get_descendants(v) for v in graph.nodes()):
+            continue
+        if arrows(pattern(graph)) != arrows(reference):
+            continue
+        shared = arrows(graph) if shared is None else shared & arrows(graph)
+    return shared
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_recursion_rules(seed):
+    dag = random_dag(seed, n_nodes=6, density=0.45)
+    graph = pattern(dag)
+    oriented = orient(graph)
+    assert oriented == brute_force_fixpoint(graph)
+    assert oriented == essential_arrows(dag)
@@ -0,0 +1,95 @@
+"""
+Round-trips of graphs, IC* results and validation results through the binary format
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from causaldag import Graph, CausalDAG, IC_star, Implications, FisherZTest
+from causaldag.io import save, load
+
+EDGES = [('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'd'), ('d', 'e')]
+
+
+@pytest.fixture
+def dag():
+    dag = CausalDAG()
+    for (v_a, v_b) in EDGES:
+        dag.add_edge(v_a, v_b)
+    dag.add_node('isolated')
+    return dag
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    n = 2000
+    a = rng.normal(size=n)
+    b = a + rng.normal(size=n)
+    c = a + rng.normal(size=n)
+    d = b + c + rng.normal(size=n)
+    e = d + rng.normal(size=n)
+    return pd.DataFrame({'a': a, 'b': b, 'c': c, 'd': d, 'e': e, 'isolated': rng.normal(size=n)})
+
+
+def assert_same_graph(loaded, graph):
+    assert type(loaded) is type(graph)
+    assert loaded.nodes() == graph.nodes()
+    assert sorted(loaded.edges()) == sorted(graph.edges())
+    for (v_a, v_b) in graph.edges():
+        assert loaded.get_edge_orientation(v_a, v_b) == graph.get_edge_orientation(v_a, v_b)
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_graphs(tmp_path, dag, mmap):
+    graph = Graph()
+    for (v_a, v_b) in EDGES:
+        graph.add_edge(v_a, v_b)
+    graph.set_edge_orientation('d', 'b')
+    for obj in (dag, graph, CausalDAG()):
+        save(obj, tmp_path / 'graph.cdag')
+        assert_same_graph(load(tmp_path / 'graph.cdag', mmap=mmap), obj)
+
+
+def test_inference(tmp_path, data):
+    inference = IC_star(data, FisherZTest())
+    save(inference, tmp_path / 'inference.cdag')
+    loaded = load(tmp_path / 'inference.cdag')
+    
+    assert_same_graph(loaded.graph, inference.graph)
+    assert loaded.conditioning_sets == {edge: tuple(z) for edge, z in inference.conditioning_sets.items()}
+    assert loaded.weakest_tests == {edge: (tuple(z), pvalue) for edge, (z, pvalue) in inference.weakest_tests.items()
+                                    if z is not None}
+    
+    # The loaded result can be updated once it has a test again
+    loaded.independence_test = FisherZTest()
+    loaded.update(data)
+    inference.update(data)
+    assert_same_graph(loaded.graph, inference.graph)
+
+
+def test_implications(tmp_path, dag, data):
+    implications = Implications(dag, data, FisherZTest())
+    save(implications, tmp_path / 'implications.cdag')
+    loaded = load(tmp_path / 'implications.cdag')
+    
+    assert_same_graph(loaded.graph, implications.graph)
+    assert loaded.basis == implications.basis
+    for name in ['implications', 'agreements', 'weak_contradictions', 'strong_contradictions']:
+        table = getattr(loaded, name)
+        assert list(table) == [tuple(row) for row in getattr(implications, name)]
+        if len(table) > 0:
+            assert table[-1] == tuple(getattr(implications, name)[-1])
+            assert table[1:3] == [tuple(row) for row in getattr(implications, name)[1:3]]
+
+
+def test_wrong_input(tmp_path):
+    graph = Graph()
+    graph.add_edge(1, 2)
+    with pytest.raises(ValueError):
+        save(graph, tmp_path / 'graph.cdag')
+    with pytest.raises(ValueError):
+        save({}, tmp_path / 'graph.cdag')
+        
+    (tmp_path / 'other').write_bytes(b'not a causaldag file')
+    with pytest.raises(ValueError):
+        load(tmp_path / 'other')
@@ -0,0 +1,107 @@
+"""
+Checks of the Cholesky factor updates and the Gram matrix regressions against direct computations
+"""
+import concurrent.futures
+import random
+import numpy as np
+import pytest
+from causaldag.regression import CholeskyFactor, GramRegression
+
+SEEDS = range(20)
+
+
+def random_gram(seed, n_rows=50, n_columns=8, collinear=True):
+    rng = np.random.default_rng(seed)
+    data = rng.normal(size=(n_rows, n_columns))
+    if collinear:
+        # The last column is a combination of the first two
+        data[:, -1] = data[:, 0] - 2 * data[:, 1]
+    return data, data.T @ data
+
+
+def assert_factor(factor, gram):
+    columns = list(factor.columns)
+    expected = np.linalg.cholesky(gram[np.ix_(columns, columns)]).T
+    # Factors are unique up to the sign of their rows
+    signs = np.sign(np.diag(factor.factor))[:, None] if len(columns) > 0 else 1
+    np.testing.assert_allclose(factor.factor * signs, expected, atol=1e-8)
+    np.testing.assert_allclose(np.tril(factor.factor, -1), 0, atol=1e-12)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_append_delete(seed):
+    rng = random.Random(seed)
+    _, gram = random_gram(seed, collinear=False)
+    factor = CholeskyFactor(gram)
+    for _ in range(40):
+        if len(factor.columns) > 0 and rng.random() < 0.4:
+            factor = factor.delete(rng.choice(factor.columns))
+        else:
+            factor = factor.append(rng.randrange(gram.shape[0]))
+        assert factor.dropped == frozenset()
+        assert_factor(factor, gram)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_collinear_columns(seed):
+    _, gram = random_gram(seed)
+    last = gram.shape[0] - 1
+    factor = CholeskyFactor(gram).extend([0, 1, last])
+    assert factor.columns == (0, 1) and factor.dropped == frozenset([last])
+    assert_factor(factor, gram)
+    
+    # Once a column it depends on is removed, the dropped column is added back
+    factor = factor.delete(0)
+    assert set(factor.columns) == {1, last} and factor.dropped == frozenset()
+    assert_factor(factor, gram)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_project(seed):
+    data, gram = random_gram(seed, collinear=False)
+    factor = CholeskyFactor(gram).extend([0, 2, 3])
+    coefficients = np.linalg.lstsq(data[:, [0, 2, 3]], data[:, [1, 4]], rcond=None)[0]
+    residuals = data[:, [1, 4]] - data[:, [0, 2, 3]] @ coefficients
+    np.testing.assert_allclose(factor.project([1, 4]), residuals.T @ residuals, atol=1e-8)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_regressions(seed):
+    data, gram = random_gram(seed)
+    n, p = data.shape
+    columns = ['v{}'.format(i) for i in range(p)]
+    regression = GramRegression(data.T @ data, columns, n, means=data.mean(axis=0))
+    rng = random.Random(seed)
+    
+    z_sets = [rng.sample(columns[2:], rng.randint(0, 4)) for _ in range(30)]
+    coefficients, standard_errors, _ = regression.regress_sets('v0', 'v1', z_sets)
+    for z, coefficient, standard_error in zip(z_sets, coefficients, standard_errors):
+        # Least squares on the rows, with an intercept; collinear variables have no effect on x
+        design = np.column_stack([data[:, [columns.index(v) for v in ['v0'] + z]], np.ones(n)])
+        expected, _, rank, _ = np.linalg.lstsq(design, data[:, 1], rcond=None)
+        residuals = data[:, 1] - design @ expected
+        x_residuals = data[:, 0] - design[:, 1:] @ np.linalg.lstsq(design[:, 1:], data[:, 0], rcond=None)[0]
+        expected_error = np.sqrt(residuals @ residuals / (n - rank) / (x_residuals @ x_residuals))
+        
+        np.testing.assert_allclose(coefficient, expected[0], rtol=1e-6, atol=1e-8)
+        # y is an exact combination of x and z when z includes the collinear column: the error is then 0,
+        # up to the cancellation in the residual sum of squares computed from the Gram matrix
+        np.testing.assert_allclose(standard_error, expected_error, rtol=1e-6, atol=1e-7)
+        np.testing.assert_allclose(regression.regress(['v0'], 'v1', z)[0][0], expected[0], rtol=1e-6, atol=1e-8)
+
+
+def test_threads_share_factor_cache():
+    data, _ = random_gram(0, n_rows=200, n_columns=10, collinear=False)
+    columns = ['v{}'.format(i) for i in range(data.shape[1])]
+    rng = random.Random(0)
+    queries = [rng.sample(columns[2:], rng.randint(0, 5)) for _ in range(2000)]
+    
+    def coefficient(regression, z):
+        return regression.regress(['v0'], 'v1', z)[0][0]
+    
+    serial = GramRegression(data.T @ data, columns, len(data), means=data.mean(axis=0))
+    expected = [coefficient(serial, z) for z in queries]
+    shared = GramRegression(data.T @ data, columns, len(data), means=data.mean(axis=0), maxsize=16)
+    with concurrent.futures.ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda z: coefficient(shared, z), queries))
+    np.testing.assert_allclose(results, expected, rtol=1e-8, atol=1e-12)